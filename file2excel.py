@@ -1,12 +1,20 @@
 import os
-import openpyxl
-import time
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # 命令行模式（python -m file2excel scan ROOT ...）：不导入tkinter，可在无显示环境的服务器上运行
+    from file2excel_core import main
+    sys.exit(main())
+
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk, Listbox, Scrollbar
+from tkinter import messagebox, ttk, Scrollbar
 import threading
-import math
-import csv
-from collections import defaultdict
+from file2excel_core import (CSV_COMPRESSIONS, DEFAULT_TOP_K, KIND_FILE, CancelToken, CompressedCsvSink, CsvSink, MultiSink,
+                             ScanExportPipeline, ScanIndex, ScanResult, OperationCancelled, ParquetSink, SqliteSink,
+                             TreeWatcher, convert_size, default_output_path,
+                             startup_elapsed, RESTAT_WORKERS, excel_sink_class, export_result, iter_scan,
+                             parquet_available, sink_paths)
+from file2excel_view import ScanResultRows, UIEventBus, VirtualListbox
  
 class FileScanner:
     def __init__(self):
@@ -15,146 +23,77 @@ class FileScanner:
         self.current_thread = None
         self.file_cache = []  # 新增缓存机制
         self.file_count = 0  # 新增文件计数器
+        self.scan_result = None  # 列式扫描结果（含stat结果）
+        self.cancel_token = None  # 当前扫描或导出的取消标记（CancelToken）
+        self.excel_engine = "native"  # Excel写出引擎：native（内置，更快）或openpyxl
+        self.csv_compression = ""  # CSV压缩格式：""（不压缩）、gzip、bz2或xz
+        self.compress_level = None  # 压缩级别，None为该格式的默认级别
+        self.watcher = None  # 实时监控（TreeWatcher）
+        self.watch_changes = []  # 待应用到文件列表的监控变更
+        self.ui = UIEventBus(window)  # 工作线程通过事件队列更新界面，不直接操作Tk控件
         self.large_files_warning_given = False  # 新增警告标记
 
-    def export_file_info_to_excel(self, folder_path, export_options, status_label, all_items, include_subfolders, progress_var, progress_label, progress_bar):
-        """将文件夹中的文件信息导出到Excel，基于已扫描的文件列表"""
+    def export_file_info(self, folder_path, export_options, status_label, scan_result, export_formats, progress_var, progress_label, progress_bar, stop_button=None):
+        """将文件信息一次导出为所选的全部格式（CSV、Excel），基于已扫描的文件列表
+        每行只格式化一次并同时写入所有格式，不再先导出CSV再重新读取转换"""
         self.exporting = True
         try:
             if not os.path.exists(folder_path):
-                messagebox.showerror("错误", f"文件夹路径不存在: {folder_path}")
+                self.ui.post(messagebox.showerror, "错误", f"文件夹路径不存在: {folder_path}")
                 return
-            status_label.config(text="正在处理...")
-            window.update_idletasks()
-
-            # 获取文件夹名称
-            folder_path = os.path.normpath(folder_path)
-            drive, tail = os.path.splitdrive(folder_path)
-            if os.path.isdir(folder_path) and drive and tail in ('\\', '/'):
-                folder_name = drive.rstrip(':')
-            else:
-                folder_name = os.path.basename(folder_path)
-
-            excel_path = os.path.join(folder_path, f"{folder_name}.xlsx")
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-
-            headers = ["序号", "文件夹", "文件名"]
-            if export_options["size"]:
-                headers.append("文件大小")
-            if export_options["ctime"]:
-                headers.append("创建时间")
-            if export_options["mtime"]:
-                headers.append("修改时间")
-            if export_options["ext"]:
-                headers.append("文件类型")
-            if export_options["path"]:
-                headers.append("文件路径")
-            sheet.append(headers)
-
-            total_size = 0
-            file_count = 0
-            folder_count = 0
-            file_type_counts = defaultdict(int)
-            index = 1  # 序号从1开始
-
-            # 直接使用传入的all_items，不再重新扫描
-            all_items = sorted(all_items)
-            total_items = len(all_items)
-
-            # 批量处理，减少进度条更新频率
-            batch_size = max(1000, total_items // 50)
-
-            # 初始化进度条
-            self.update_progress_bar(progress_var, progress_label, 0, total_items, progress_bar)
-
-            for i, itempath in enumerate(all_items):
-                if i % batch_size == 0:  # 减少进度条更新频率
-                    self.update_progress_bar(progress_var, progress_label, i, total_items, progress_bar)
-                    window.update_idletasks()
-
-                if os.path.isfile(itempath):
-                    # 处理文件
-                    file_size, file_ctime, file_mtime, file_ext = self.get_file_info(itempath)
-                    if file_size is not None:
-                        relative_path = os.path.relpath(itempath, folder_path)
-                        folder_display = ""  # 默认：顶级文件不显示文件夹
-                        if os.path.dirname(relative_path) != ".":  # 检查文件是否在子文件夹中
-                            folder_display = os.path.dirname(relative_path)
-                        row = [index, folder_display, os.path.basename(itempath)]
-                        if export_options["size"]:
-                            row.append(self.convert_size(file_size))
-                        if export_options["ctime"]:
-                            row.append(file_ctime)
-                        if export_options["mtime"]:
-                            row.append(file_mtime)
-                        if export_options["ext"]:
-                            row.append(file_ext)
-                        if export_options["path"]:
-                            row.append(itempath)
-
-                        sheet.append(row)
-
-                        total_size += file_size
-                        file_count += 1
-                        file_type_counts[file_ext] += 1
-                        index += 1  # 序号+1
-                elif os.path.isdir(itempath):
-                    # 处理文件夹
-                    relative_path = os.path.relpath(itempath, folder_path)
-                    folder_display = relative_path
-                    row = [index, folder_display, ""]
-                    sheet.append(row)
-                    folder_count += 1
-                    index += 1
-
-            # 最终更新进度条
-            self.update_progress_bar(progress_var, progress_label, total_items, total_items, progress_bar)
-
-            # 添加统计信息
-            sheet.append([])  # 空行用于分隔
-            sheet.append(["统计信息"])
-            sheet.append(["文件总数", file_count])
-            sheet.append(["文件夹总数", folder_count])
-            sheet.append(["文件夹总大小", self.convert_size(total_size)])
-
-            # 批量添加文件类型统计
-            for file_type, count in file_type_counts.items():
-                sheet.append([f"{file_type} 文件数量", count])
-
-            workbook.save(excel_path)
-            status_label.config(text=f"文件信息已导出到: {excel_path}")
-            messagebox.showinfo("成功", f"Excel文件已保存到: {excel_path}")
-
+            self.ui.post(status_label.config, text="正在处理...")
+            sink = self.export_sink(folder_path, export_formats, export_options.get("typed"))
+
+            # 直接使用扫描时记录的stat结果，不再访问文件系统；进度只投递到事件队列，由主线程按固定帧率重绘
+            export_result(scan_result, sink, export_options,
+                          progress=lambda current, total: self.ui.latest(self.update_progress_bar, progress_var,
+                                                                         progress_label, current, total, progress_bar),
+                          cancel_token=self.cancel_token,
+                          restat_workers=RESTAT_WORKERS if export_options.get("restat") else 0)
+
+            paths = sink_paths(sink)
+            self.ui.post(status_label.config, text=f"文件信息已导出到: {'、'.join(paths)}")
+            self.ui.post(messagebox.showinfo, "成功", "文件信息已导出到:\n" + "\n".join(paths))
+
+        except OperationCancelled:
+            self.ui.post(status_label.config, text="导出已取消，未生成文件")
         except Exception as e:
-            status_label.config(text="发生错误！")
-            messagebox.showerror("错误", f"导出到Excel失败: {e}")
+            self.ui.post(status_label.config, text="发生错误！")
+            self.ui.post(messagebox.showerror, "错误", f"导出失败: {e}")
         finally:
             self.exporting = False
-            self.update_progress_bar(progress_var, progress_label, 0, 1, progress_bar)
+            self.ui.latest(self.update_progress_bar, progress_var, progress_label, 0, 1, progress_bar)
+            if stop_button:
+                self.ui.post(stop_button.config, state=tk.DISABLED)
+
+    def set_csv_compression(self, compression, level):
+        """记录界面上选择的CSV压缩格式和级别（“不压缩”、“默认”按未选择处理）"""
+        self.csv_compression = compression if compression in CSV_COMPRESSIONS else ""
+        self.compress_level = int(level) if str(level).isdigit() else None
+
+    def export_sink(self, folder_path, export_formats, typed=False):
+        """按所选格式创建输出；选择多种格式时合并为MultiSink，一次遍历同时写出（typed为原始数值模式）"""
+        sinks = []
+        if "csv" in export_formats:
+            if self.csv_compression:
+                # 压缩在后台线程中进行，写盘的数据量只有原来的几分之一
+                extension = CompressedCsvSink.extension_for(self.csv_compression)
+                sinks.append(CompressedCsvSink(default_output_path(folder_path, extension), self.csv_compression,
+                                               self.compress_level))
+            else:
+                sinks.append(CsvSink(default_output_path(folder_path, CsvSink.extension)))
+        if "excel" in export_formats:
+            sink_class = excel_sink_class(self.excel_engine)
+            sinks.append(sink_class(default_output_path(folder_path, sink_class.extension)))
+        if "parquet" in export_formats:
+            sinks.append(ParquetSink(default_output_path(folder_path, ParquetSink.extension), typed=typed))
+        if "sqlite" in export_formats:
+            sinks.append(SqliteSink(default_output_path(folder_path, SqliteSink.extension)))
+        return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
 
     def convert_size(self, size_bytes):
         """转换文件大小为KB, MB, GB, TB等"""
-        if size_bytes == 0:
-            return "0B"
-        size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-        i = int(math.floor(math.log(size_bytes, 1024)))
-        p = math.pow(1024, i)
-        s = round(size_bytes / p, 2)
-        return f"{s} {size_name[i]}"
- 
-    def get_file_info(self, filepath):
-        """获取文件信息"""
-        try:
-            file_size = os.path.getsize(filepath)
-            file_ctime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getctime(filepath)))
-            file_mtime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getmtime(filepath)))
-            file_ext = os.path.splitext(filepath)[1]  # 获取文件扩展名
-            return file_size, file_ctime, file_mtime, file_ext
-        except FileNotFoundError:
-            return None, None, None, None
-        except Exception as e:
-            return None, None, None, None
+        return convert_size(size_bytes)
  
     def update_progress_bar(self, progress_var, progress_label, current, total, progress_bar):
         """更新进度条和进度标签"""
@@ -167,23 +106,6 @@ class FileScanner:
         else:
             progress_bar.pack(pady=(0, 10), fill=tk.X, padx=5)  # Show the progress bar, fill horizontally, add padding
             progress_label.pack(pady=(0, 10))
-        window.update_idletasks()
- 
-    def start_export(self, folder_entry, export_options, status_label, file_listbox, include_subfolders, progress_var, progress_label, progress_bar):
-        """启动导出操作"""
-        if not self.exporting and not self.scanning:
-            folder_path = folder_entry.get()
-            if not folder_path:
-                messagebox.showerror("错误", "请选择文件夹")
-                return
-            # 检查文件列表是否为空
-            if file_listbox.size() == 0:
-                messagebox.showerror("错误", "请先扫描文件夹获取文件列表")
-                return
-            self.exporting = True
-            thread = threading.Thread(target=self.export_file_info_to_excel,
-                                    args=(folder_path, export_options, status_label, file_listbox, include_subfolders, progress_var, progress_label, progress_bar))
-            thread.start()
  
     def show_large_files_warning(self):
         """显示大文件数量警告"""
@@ -191,158 +113,12 @@ class FileScanner:
                              "当前检测到超过10,000个文件，扫描可能需要较长时间\n是否要继续扫描？") == tk.NO:
             self.stop_scan()
  
-    def export_file_info_to_csv(self, folder_path, export_options, status_label, all_items, include_subfolders, progress_var, progress_label, progress_bar):
-        """将文件夹中的文件信息导出到CSV，基于已扫描的文件列表"""
-        self.exporting = True
-        try:
-            if not os.path.exists(folder_path):
-                messagebox.showerror("错误", f"文件夹路径不存在: {folder_path}")
-                return
-            status_label.config(text="正在处理...")
-            window.update_idletasks()
- 
-            # 修改获取文件夹名称的逻辑
-            folder_path = os.path.normpath(folder_path)
-            drive, tail = os.path.splitdrive(folder_path) 
-             
-            # 判断是否为盘符根目录（兼容不同分隔符）
-            if os.path.isdir(folder_path) and drive and tail in ('\\', '/'):
-                folder_name = drive.rstrip(':')
-            else:
-                folder_name = os.path.basename(folder_path)
- 
-            csv_path = os.path.join(folder_path, f"{folder_name}.csv")
-            
-            headers = ["序号", "文件夹", "文件名"]
-            if export_options["size"]:
-                headers.append("文件大小")
-            if export_options["ctime"]:
-                headers.append("创建时间")
-            if export_options["mtime"]:
-                headers.append("修改时间")
-            if export_options["ext"]:
-                headers.append("文件类型")
-            if export_options["path"]:
-                headers.append("文件路径")
-            
-            total_size = 0
-            file_count = 0
-            folder_count = 0
-            file_type_counts = defaultdict(int)
-            index = 1  # 序号从1开始
- 
-            # 直接使用传入的all_items，不再重新扫描
-            all_items = sorted(all_items)
-            total_items = len(all_items)
-            
-            # 批量处理，减少进度条更新频率
-            batch_size = max(1000, total_items // 50)  # CSV处理可以用更大的批次
-            
-            # 初始化进度条
-            self.update_progress_bar(progress_var, progress_label, 0, total_items, progress_bar)
-            
-            # 使用CSV写入器
-            with open(csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(headers)
-                
-                # 预先收集文件信息，减少IO操作
-                for i, itempath in enumerate(all_items):
-                    if i % batch_size == 0:  # 减少进度条更新频率
-                        self.update_progress_bar(progress_var, progress_label, i, total_items, progress_bar)
-                        window.update_idletasks()
-     
-                    if os.path.isfile(itempath):
-                        # Process files
-                        file_size, file_ctime, file_mtime, file_ext = self.get_file_info(itempath)
-                        if file_size is not None:
-                            relative_path = os.path.relpath(itempath, folder_path)
-                            folder_display = ""  # Default: no folder display for top-level files
-                            if os.path.dirname(relative_path) != ".":  # Check if the file is in a subfolder
-                                folder_display = os.path.dirname(relative_path)
-                            row = [index, folder_display, os.path.basename(itempath)]
-                            if export_options["size"]:
-                                row.append(self.convert_size(file_size))
-                            if export_options["ctime"]:
-                                row.append(file_ctime)
-                            if export_options["mtime"]:
-                                row.append(file_mtime)
-                            if export_options["ext"]:
-                                row.append(file_ext)
-                            if export_options["path"]:
-                                row.append(itempath)
-     
-                            writer.writerow(row)
-     
-                            total_size += file_size
-                            file_count += 1
-                            file_type_counts[file_ext] += 1
-                            index += 1  # 序号+1
-                    elif os.path.isdir(itempath):
-                        # Process folders
-                        relative_path = os.path.relpath(itempath, folder_path)
-                        folder_display = relative_path
-                        row = [index, folder_display, ""]
-                        writer.writerow(row)
-                        folder_count += 1
-                        index += 1
-                
-                # 最终更新进度条
-                self.update_progress_bar(progress_var, progress_label, total_items, total_items, progress_bar)
-                
-                # Add Summary Section
-                writer.writerow([])  # Empty row for spacing
-                writer.writerow(["统计信息"])
-                writer.writerow(["文件总数", file_count])
-                writer.writerow(["文件夹总数", folder_count])
-                writer.writerow(["文件夹总大小", self.convert_size(total_size)])
-                
-                # 批量添加文件类型统计
-                for file_type, count in file_type_counts.items():
-                    writer.writerow([f"{file_type} 文件数量", count])
- 
-            status_label.config(text=f"文件信息已导出到: {csv_path}")
-            
-            # 询问是否转换为Excel
-            if messagebox.askyesno("导出完成", f"CSV文件已保存到: {csv_path}\n是否需要转换为Excel格式?"):
-                self.convert_csv_to_excel(csv_path, status_label)
-            else:
-                messagebox.showinfo("成功", f"文件信息已导出到: {csv_path}")
-                
-        except Exception as e:
-            status_label.config(text="发生错误！")
-            messagebox.showerror("错误", f"导出到CSV失败: {e}")
-        finally:
-            self.exporting = False
-            self.update_progress_bar(progress_var, progress_label, 0, 1, progress_bar)
-    
-    def convert_csv_to_excel(self, csv_path, status_label):
-        """将CSV文件转换为Excel格式"""
-        try:
-            status_label.config(text="正在转换为Excel格式...")
-            window.update_idletasks()
-            
-            excel_path = os.path.splitext(csv_path)[0] + ".xlsx"
-            workbook = openpyxl.Workbook(write_only=True)
-            sheet = workbook.create_sheet()
-            
-            with open(csv_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    sheet.append(row)
-            
-            workbook.save(excel_path)
-            status_label.config(text=f"文件信息已导出到: {excel_path}")
-            messagebox.showinfo("成功", f"Excel文件已保存到: {excel_path}")
-        except Exception as e:
-            status_label.config(text="转换Excel失败！")
-            messagebox.showerror("错误", f"转换为Excel失败: {e}")
-    
     def browse_folder(self, folder_entry, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button, stop_button):
         """浏览文件夹，带进度显示"""
         if self.scanning or self.exporting:
             messagebox.showerror("提示", "请停止当前任务再选择目录！")
             return
+        from tkinter import filedialog  # 首次浏览时才加载文件对话框模块
         folder_selected = filedialog.askdirectory()
         if folder_selected:
             folder_entry.delete(0, tk.END)
@@ -351,7 +127,7 @@ class FileScanner:
             # 如果需要自动开始扫描，可以取消下面这行的注释
             # self.start_scan(folder_selected, file_listbox, include_subfolders.get(), progress_var, progress_label, progress_bar, scan_button, stop_button)
     
-    def start_scan(self, folder_path, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button, stop_button):
+    def start_scan(self, folder_path, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button, stop_button, scan_workers=1, use_cache=False, watch=False):
         """启动扫描操作"""
         if not self.scanning and not self.exporting:
             # 检查文件夹路径是否存在
@@ -359,75 +135,152 @@ class FileScanner:
                 messagebox.showerror("错误", f"文件夹路径不存在: {folder_path}")
                 return  # 直接返回，不改变按钮状态
  
+            self.stop_watch()
             self.scanning = True
             scan_button.config(state=tk.DISABLED)
             stop_button.config(state=tk.NORMAL)
  
+            self.cancel_token = CancelToken()
             self.current_thread = threading.Thread(target=self.update_file_list,
-                                               args=(folder_path, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button, stop_button))
+                                               args=(folder_path, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button, stop_button, scan_workers, use_cache, watch))
             self.current_thread.start()
     
-    def update_file_list(self, folder_path, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button=None, stop_button=None):
+    def update_file_list(self, folder_path, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, scan_button=None, stop_button=None, scan_workers=1, use_cache=False, watch=False):
         """更新文件列表，带进度显示"""
         self.file_count = 0
         self.large_files_warning_given = False
         if not self.scanning:
             return
             
-        all_items = []
-        
-        # 优化后的扫描逻辑（比原方法快3-5倍）
-        if include_subfolders:
-            # 使用scandir进行递归扫描
-            for root, dirs, files in os.walk(folder_path, topdown=True):
-                if not self.scanning:
-                    break
-                with os.scandir(root) as it:
-                    # 批量添加条目（比逐条添加快2倍）
-                    all_items.extend(entry.path for entry in it)
-                    # 使用生成器表达式统计文件数量
-                    self.file_count += sum(1 for entry in it if entry.is_file())
-        else:
-            # 非递归扫描直接使用scandir
-            with os.scandir(folder_path) as it:
-                all_items = [entry.path for entry in it]
-                self.file_count = sum(1 for entry in it if entry.is_file())
-
-        # 批量加载策略（比逐条插入快10倍以上）
-        batch_size = 1000
-        total_items = len(all_items)
+        try:
+            self.scan_result = ScanResult(folder_path)
         
-        # 清空列表后批量插入
-        file_listbox.delete(0, tk.END)
-        for i in range(0, total_items, batch_size):
-            if not self.scanning:
-                break
-            batch = all_items[i:i+batch_size]
-            file_listbox.insert(tk.END, *batch)  # 批量插入
-            self.update_progress_bar(progress_var, progress_label, min(i+batch_size, total_items), total_items, progress_bar)
-            window.update_idletasks()  # 使用更轻量的更新方法
-        self.update_progress_bar(progress_var, progress_label, total_items, total_items, progress_bar)
-        self.stop_scan(scan_button, stop_button)
-    
+            # 单遍扫描：每个目录只读取一次；scan_workers>1时并行读取目录；use_cache时只重新读取有变化的目录
+            # 每个条目只stat一次，结果以列式结构保存，导出时不再访问文件系统
+            index = ScanIndex() if use_cache else None
+            scan_steps = iter_scan(self.scan_result, include_subfolders, scan_workers, index, self.cancel_token)
+            try:
+                # 停止扫描时iter_scan在下一个条目处结束，已扫描的条目保留在结果中
+                for _ in scan_steps:
+                    pass
+            finally:
+                scan_steps.close()
+                if index is not None:
+                    index.close()
+            self.scan_result.finish()
+            self.file_count = self.scan_result.kinds.count(KIND_FILE)
+
+            # 虚拟列表只渲染可见行，直接以扫描结果为数据源，无需把路径逐条插入Tk
+            total_items = len(self.scan_result)
+            self.ui.post(file_listbox.set_rows, ScanResultRows(self.scan_result))
+            self.ui.latest(self.update_progress_bar, progress_var, progress_label, total_items, total_items, progress_bar)
+            cancelled = self.cancel_token.is_cancelled()
+            if watch and not cancelled:
+                # 登记监控要遍历所有文件夹，在扫描线程中完成，不占用界面线程
+                self.start_watch(file_listbox, include_subfolders)
+        finally:
+            # 无论正常结束、被取消还是出错，都由扫描线程自己复位状态
+            self.scanning = False
+            self.ui.post(self.scan_finished, scan_button, stop_button)
+
+    def start_watch(self, file_listbox, include_subfolders):
+        """扫描完成后启动实时监控（仅Linux，在扫描线程中调用），把后续变更增量应用到扫描结果和文件列表"""
+        try:
+            watcher = TreeWatcher(self.scan_result, include_subfolders,
+                                  on_change=lambda action, index: self.on_watch_change(file_listbox, action, index))
+            watcher.start()
+            self.watcher = watcher
+        except OSError as e:
+            self.watcher = None
+            self.ui.post(messagebox.showwarning, "提示", f"无法启动实时监控: {e}")
+
+    def stop_watch(self):
+        """停止实时监控"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def on_watch_change(self, file_listbox, action, index):
+        """实时监控回调（在监控线程中调用），变更先排队，再由Tk主线程批量应用"""
+        self.watch_changes.append((action, index))
+        self.ui.latest(self.apply_watch_changes, file_listbox)
+
+    def apply_watch_changes(self, file_listbox):
+        """批量把监控到的新增和删除应用到文件列表"""
+        changes, self.watch_changes = self.watch_changes, []
+        added_count = removed_count = 0
+        for action, index in changes:
+            if action == "add":
+                added_count += 1
+            elif action == "remove":
+                removed_count += 1
+            elif action == "overflow":
+                messagebox.showwarning("提示", "监控事件过多已丢失部分变更，请重新扫描")
+        if added_count or removed_count:
+            # 虚拟列表直接读取扫描结果，只需重建行号映射并重绘可见行
+            file_listbox.rows.invalidate()
+            file_listbox.refresh()
+
+    def start_stream_export(self, folder_entry, export_options, status_label, include_subfolders, export_formats, scan_workers, stop_button, excel_engine="native", csv_compression="", compress_level="默认"):
+        """启动流水线导出：边扫描边写出，无需先扫描"""
+        if not self.exporting and not self.scanning:
+            folder_path = folder_entry.get()
+            if not folder_path or not os.path.isdir(folder_path):
+                messagebox.showerror("错误", f"文件夹路径不存在: {folder_path}")
+                return
+            export_formats = [name for name, selected in export_formats.items() if selected]
+            if not export_formats:
+                messagebox.showerror("错误", "请至少选择一种导出格式")
+                return
+            if export_options.get("rollup"):
+                # 与命令行的--rollup/--stream相同：文件夹汇总需要完整的扫描结果
+                messagebox.showerror("错误", "文件夹汇总需要完整的扫描结果，请取消勾选“文件夹汇总”，或先扫描再导出")
+                return
+            self.exporting = True
+            self.cancel_token = CancelToken()
+            self.excel_engine = excel_engine
+            self.set_csv_compression(csv_compression, compress_level)
+            stop_button.config(state=tk.NORMAL)
+            thread = threading.Thread(target=self.stream_export,
+                                      args=(folder_path, export_options, status_label, include_subfolders, export_formats, scan_workers, stop_button))
+            thread.start()
+
+    def stream_export(self, folder_path, export_options, status_label, include_subfolders, export_formats, scan_workers, stop_button):
+        """流水线导出：扫描线程与写出同时进行，内存占用与条目数无关（按扫描顺序输出）"""
+        try:
+            sink = self.export_sink(folder_path, export_formats, export_options.get("typed"))
+            pipeline = ScanExportPipeline(folder_path, sink, export_options, include_subfolders, scan_workers,
+                                          cancel_token=self.cancel_token)
+            self.ui.post(status_label.config, text="正在扫描并导出...")
+            pipeline.run(progress=lambda rows: self.ui.latest(status_label.config, text=f"正在扫描并导出... 已写出 {rows} 行"))
+            paths = sink_paths(sink)
+            self.ui.post(status_label.config, text=f"文件信息已导出到: {'、'.join(paths)}")
+            self.ui.post(messagebox.showinfo, "成功", "文件信息已导出到:\n" + "\n".join(paths))
+        except OperationCancelled:
+            self.ui.post(status_label.config, text="扫描并导出已取消，未生成文件")
+        except Exception as e:
+            self.ui.post(status_label.config, text="发生错误！")
+            self.ui.post(messagebox.showerror, "错误", f"扫描并导出失败: {e}")
+        finally:
+            self.exporting = False
+            self.ui.post(stop_button.config, state=tk.DISABLED)
+
     def stop_scan(self, scan_button=None, stop_button=None):
-        """停止扫描操作"""
-        self.scanning = False
-        if self.current_thread and self.current_thread.is_alive() and self.current_thread != threading.current_thread():
-            # 设置超时时间，防止线程卡死
-            self.current_thread.join(timeout=1.0)
-            if self.current_thread.is_alive():
-                # 如果线程仍在运行，强制终止
-                import ctypes
-                thread_id = self.current_thread.ident
-                ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, ctypes.py_object(SystemExit))
-        
-        # 更新按钮状态
+        """停止扫描或导出：只设置取消标记，工作线程在下一个条目或批次处自行结束
+        已扫描的条目保留在结果中，可以直接导出；写到一半的导出文件会被删除"""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        if stop_button:
+            stop_button.config(state=tk.DISABLED)
+
+    def scan_finished(self, scan_button=None, stop_button=None):
+        """扫描线程结束后（在主线程中）恢复按钮状态"""
         if scan_button and stop_button:
             scan_button.config(state=tk.NORMAL)
             stop_button.config(state=tk.DISABLED)
-    
-    def start_export(self, folder_entry, export_options, status_label, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, export_format):
-        """启动导出操作"""
+
+    def start_export(self, folder_entry, export_options, status_label, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, export_formats, stop_button=None, excel_engine=None, csv_compression=None, compress_level=None):
+        """启动导出操作：所选的全部格式在同一次遍历中写出"""
         if not self.exporting and not self.scanning:
             folder_path = folder_entry.get()
             if not folder_path:
@@ -437,20 +290,37 @@ class FileScanner:
             if file_listbox.size() == 0:
                 messagebox.showerror("错误", "请先扫描文件夹获取文件列表")
                 return
-            # 从file_listbox中获取所有项目
-            all_items = [file_listbox.get(i) for i in range(file_listbox.size())]
+            export_formats = [name for name, selected in export_formats.items() if selected]
+            if not export_formats:
+                messagebox.showerror("错误", "请至少选择一种导出格式")
+                return
+            # 使用扫描时保存的列式结果（含stat结果），不再从file_listbox逐条读取
+            scan_result = self.scan_result
              
             self.exporting = True
+            self.cancel_token = CancelToken()
+            if excel_engine is not None:
+                self.excel_engine = excel_engine.get()
+            if csv_compression is not None:
+                self.set_csv_compression(csv_compression.get(), compress_level.get())
+            if stop_button:
+                stop_button.config(state=tk.NORMAL)  # 导出期间可停止
             
-            # 根据选择的格式决定导出方法
-            if export_format.get() == "csv":
-                thread = threading.Thread(target=self.export_file_info_to_csv,
-                                        args=(folder_path, export_options, status_label, all_items, include_subfolders, progress_var, progress_label, progress_bar))
-            else:
-                thread = threading.Thread(target=self.export_file_info_to_excel,
-                                        args=(folder_path, export_options, status_label, all_items, include_subfolders, progress_var, progress_label, progress_bar))
+            thread = threading.Thread(target=self.export_file_info,
+                                    args=(folder_path, export_options, status_label, scan_result, export_formats, progress_var, progress_label, progress_bar, stop_button))
             thread.start()
  
+def report_startup_time():
+    """输出从进程启动到窗口首次空闲的耗时，然后退出（设置环境变量FILE2EXCEL_STARTUP_TIME=1时启用）"""
+    message = f"启动耗时: {startup_elapsed() * 1000:.0f} ms"
+    if sys.stderr is not None:
+        print(message, file=sys.stderr)
+    else:
+        # 无控制台的打包版本没有stderr，改为弹窗显示
+        messagebox.showinfo("启动耗时", message)
+    window.destroy()
+
+
 def create_gui():
     """创建GUI界面"""
     global window
@@ -494,7 +364,24 @@ def create_gui():
                             command=lambda: scanner.stop_scan(scan_button, stop_button))
     stop_button.pack(side=tk.LEFT, padx=10)
 
-    scan_button.config(command=lambda: scanner.start_scan(folder_entry.get(), file_listbox, include_subfolders.get(), progress_var, progress_label, progress_bar, scan_button, stop_button))
+    # 扫描选项单独一行，避免与路径输入框和按钮挤在一行中超出窗口宽度
+    scan_options_frame = tk.Frame(window)
+    scan_options_frame.pack(fill=tk.X, padx=10)
+
+    # 扫描线程数（网络共享或NVMe阵列上可调大）
+    tk.Label(scan_options_frame, text="扫描线程:", font=font_style).pack(side=tk.LEFT, padx=(10, 0))
+    scan_workers = tk.IntVar(value=1)
+    tk.Spinbox(scan_options_frame, from_=1, to=32, width=3, textvariable=scan_workers, font=font_style).pack(side=tk.LEFT, padx=(0, 10))
+
+    # 使用缓存索引：只重新读取有变化的目录
+    use_cache = tk.BooleanVar(value=False)
+    tk.Checkbutton(scan_options_frame, text="使用缓存", variable=use_cache, font=font_style).pack(side=tk.LEFT, padx=10)
+
+    # 实时监控：扫描完成后持续同步文件变更（仅Linux）
+    watch = tk.BooleanVar(value=False)
+    tk.Checkbutton(scan_options_frame, text="实时监控", variable=watch, font=font_style).pack(side=tk.LEFT, padx=10)
+
+    scan_button.config(command=lambda: scanner.start_scan(folder_entry.get(), file_listbox, include_subfolders.get(), progress_var, progress_label, progress_bar, scan_button, stop_button, scan_workers.get(), use_cache.get(), watch.get()))
 
     # 文件列表
     listbox_frame = tk.Frame(window)
@@ -504,11 +391,9 @@ def create_gui():
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
     global file_listbox
-    file_listbox = Listbox(listbox_frame, yscrollcommand=scrollbar.set, selectmode=tk.EXTENDED, font=font_style)
+    file_listbox = VirtualListbox(listbox_frame, scrollbar, selectmode=tk.EXTENDED, font=font_style)
     file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-    scrollbar.config(command=file_listbox.yview)
-
     # 导出选项
     options_frame = tk.LabelFrame(window, text="导出选项", font=font_style)
     options_frame.pack(pady=10, padx=10, fill=tk.X)
@@ -519,23 +404,67 @@ def create_gui():
         "mtime": tk.BooleanVar(value=True),
         "ext": tk.BooleanVar(value=False),
         "path": tk.BooleanVar(value=False),
+        "restat": tk.BooleanVar(value=False),  # 导出前重新读取文件信息（多线程并发，适合缓存索引或网络共享）
+        "typed": tk.BooleanVar(value=False),  # 大小写字节数、时间写Excel日期时间，便于排序和求和
+        "rollup": tk.BooleanVar(value=False),  # 文件夹行写总大小，并输出“文件夹汇总”表（边扫描边导出时不适用）
+        "ext_stats": tk.BooleanVar(value=False),  # 统计信息之后按文件类型输出大小、修改时间分布和大小分位数
+        "top": tk.BooleanVar(value=False),  # 额外输出最大文件、最大文件夹（需文件夹汇总）和最久未修改文件的排行表
+        "top_k": tk.IntVar(value=DEFAULT_TOP_K),  # 排行表的条目数
     }
 
-    tk.Checkbutton(options_frame, text="文件大小", variable=export_options["size"], font=font_style).pack(side=tk.LEFT, padx=10)
-    tk.Checkbutton(options_frame, text="创建时间", variable=export_options["ctime"], font=font_style).pack(side=tk.LEFT, padx=10)
-    tk.Checkbutton(options_frame, text="修改时间", variable=export_options["mtime"], font=font_style).pack(side=tk.LEFT, padx=10)
-    tk.Checkbutton(options_frame, text="文件类型", variable=export_options["ext"], font=font_style).pack(side=tk.LEFT, padx=10)
-    tk.Checkbutton(options_frame, text="文件路径", variable=export_options["path"], font=font_style).pack(side=tk.LEFT, padx=10)
+    # 导出列和附加报告各占一行，避免一行超出窗口宽度
+    fields_frame = tk.Frame(options_frame)
+    fields_frame.pack(fill=tk.X)
+    tk.Checkbutton(fields_frame, text="文件大小", variable=export_options["size"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(fields_frame, text="创建时间", variable=export_options["ctime"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(fields_frame, text="修改时间", variable=export_options["mtime"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(fields_frame, text="文件类型", variable=export_options["ext"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(fields_frame, text="文件路径", variable=export_options["path"], font=font_style).pack(side=tk.LEFT, padx=10)
+    report_frame = tk.Frame(options_frame)
+    report_frame.pack(fill=tk.X)
+    tk.Checkbutton(report_frame, text="重新读取属性", variable=export_options["restat"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(report_frame, text="原始数值", variable=export_options["typed"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(report_frame, text="文件夹汇总", variable=export_options["rollup"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(report_frame, text="类型统计", variable=export_options["ext_stats"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(report_frame, text="排行前", variable=export_options["top"], font=font_style).pack(side=tk.LEFT, padx=(10, 0))
+    tk.Spinbox(report_frame, values=(10, 20, 50, 100, 200, 500, 1000), width=5, textvariable=export_options["top_k"],
+               font=font_style, state="readonly").pack(side=tk.LEFT)
 
     # 添加导出格式选择
     format_frame = tk.Frame(window)
     format_frame.pack(pady=10, fill=tk.X, padx=10)
 
     tk.Label(format_frame, text="导出格式:", font=font_style).pack(side=tk.LEFT, padx=10)
-    export_format = tk.StringVar(value="csv")  # 默认使用CSV格式
-
-    tk.Radiobutton(format_frame, text="CSV格式 (更快)", variable=export_format, value="csv", font=font_style).pack(side=tk.LEFT, padx=10)
-    tk.Radiobutton(format_frame, text="Excel格式", variable=export_format, value="excel", font=font_style).pack(side=tk.LEFT, padx=10)
+    # 可同时选择多种格式，一次导出全部生成，默认使用CSV格式
+    export_formats = {"csv": tk.BooleanVar(value=True), "excel": tk.BooleanVar(value=False),
+                      "parquet": tk.BooleanVar(value=False), "sqlite": tk.BooleanVar(value=False)}
+
+    tk.Checkbutton(format_frame, text="CSV格式 (更快)", variable=export_formats["csv"], font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(format_frame, text="Excel格式", variable=export_formats["excel"], font=font_style).pack(side=tk.LEFT, padx=10)
+    # Parquet列式格式需要pyarrow，未安装时不可选
+    tk.Checkbutton(format_frame, text="Parquet格式", variable=export_formats["parquet"], font=font_style,
+                   state=tk.NORMAL if parquet_available() else tk.DISABLED).pack(side=tk.LEFT, padx=10)
+    tk.Checkbutton(format_frame, text="SQLite数据库", variable=export_formats["sqlite"], font=font_style).pack(side=tk.LEFT, padx=10)
+
+    # Excel引擎和CSV压缩设置单独一行
+    format_options_frame = tk.Frame(window)
+    format_options_frame.pack(fill=tk.X, padx=10)
+
+    # Excel写出引擎：内置引擎直接写出xlsx文件，不经过openpyxl，适合超大目录
+    tk.Label(format_options_frame, text="Excel引擎:", font=font_style).pack(side=tk.LEFT, padx=10)
+    excel_engine = tk.StringVar(value="native")
+    tk.Radiobutton(format_options_frame, text="内置 (更快)", variable=excel_engine, value="native", font=font_style).pack(side=tk.LEFT, padx=10)
+    tk.Radiobutton(format_options_frame, text="openpyxl", variable=excel_engine, value="openpyxl", font=font_style).pack(side=tk.LEFT, padx=10)
+
+    # CSV压缩：压缩在后台线程中与写出同时进行，级别越高文件越小、耗时越长
+    tk.Label(format_options_frame, text="CSV压缩:", font=font_style).pack(side=tk.LEFT, padx=(30, 10))
+    csv_compression = tk.StringVar(value="不压缩")
+    ttk.Combobox(format_options_frame, textvariable=csv_compression, values=("不压缩", *CSV_COMPRESSIONS), width=6,
+                 state="readonly").pack(side=tk.LEFT)
+    tk.Label(format_options_frame, text="级别:", font=font_style).pack(side=tk.LEFT, padx=(10, 5))
+    compress_level = tk.StringVar(value="默认")
+    tk.Spinbox(format_options_frame, values=("默认", *range(1, 10)), width=4, textvariable=compress_level, font=font_style,
+               state="readonly").pack(side=tk.LEFT)
 
     # 进度条和进度标签容器
     progress_container = tk.Frame(window)
@@ -560,9 +489,20 @@ def create_gui():
     export_button = tk.Button(export_button_frame, text="开始导出", font=("微软雅黑", 10, "bold"), width=20,  # 增加按钮宽度并加粗字体
                               bg="#3d8af7", fg="white", activebackground="#4a6fa5", activeforeground="white",  # 添加颜色
                               command=lambda: scanner.start_export(folder_entry, {k: v.get() for k, v in export_options.items()},
-                                                                  status_label, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, export_format))
+                                                                  status_label, file_listbox, include_subfolders, progress_var, progress_label, progress_bar, {k: v.get() for k, v in export_formats.items()}, stop_button, excel_engine, csv_compression, compress_level))
     export_button.pack(pady=5, anchor="center")  # 设置锚点为中心
+
+    # 流水线导出：边扫描边写出，适合超大目录
+    stream_button = tk.Button(export_button_frame, text="扫描并导出", font=font_style, width=20,
+                              command=lambda: scanner.start_stream_export(folder_entry, {k: v.get() for k, v in export_options.items()},
+                                                                          status_label, include_subfolders.get(), {k: v.get() for k, v in export_formats.items()}, scan_workers.get(), stop_button, excel_engine.get(),
+                                                                          csv_compression.get(), compress_level.get()))
+    stream_button.pack(pady=(0, 5), anchor="center")
     scanner.update_progress_bar(progress_var, progress_label, 0, 1, progress_bar)
+
+    # 启动耗时测量模式
+    if os.environ.get("FILE2EXCEL_STARTUP_TIME"):
+        window.after_idle(report_startup_time)
     window.mainloop()
  
  
@@ -0,0 +1,47 @@
+# -*- mode: python ; coding: utf-8 -*-
+# 快速启动版：目录模式（onedir）且不使用UPX压缩，启动时无需解压到临时目录，
+# 冷启动耗时明显低于单文件版。openpyxl等模块已改为首次使用时才导入。
+
+a = Analysis(
+    ['file2excel_beautified.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=['openpyxl'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['numpy', 'PIL', 'pandas', 'matplotlib'],
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='文件信息导出工具',
+    icon='folder.ico',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='文件信息导出工具',
+)
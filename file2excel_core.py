@@ -0,0 +1,2946 @@
+"""文件扫描与导出的核心逻辑（不依赖tkinter，可供GUI和命令行共用）"""
+import csv
+import io
+import math
+import os
+import queue
+import re
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from datetime import datetime
+from itertools import chain
+from heapq import heappop, heappush, heappushpop
+
+_IMPORT_TIME = time.perf_counter()
+
+# 条目类型
+KIND_FILE = 0
+KIND_DIR = 1
+KIND_OTHER = -1  # 无法stat（如失效的符号链接）或特殊文件，导出时跳过
+KIND_DELETED = -2  # 实时监控中已删除的条目（墓碑标记），显示和导出时跳过
+
+
+class OperationCancelled(Exception):
+    """操作已被取消（CancelToken）"""
+
+
+class CancelToken:
+    """协作式取消标记：遍历器按条目、导出按批次检查，取消后在毫秒级内停止
+
+    遍历被取消时只是提前结束，已扫描的条目仍然有效，可以直接导出；
+    导出被取消时抛出OperationCancelled，写到一半的文件会被删除。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.is_cancelled = self._event.is_set  # 直接绑定，热循环中检查的开销最小
+
+    def cancel(self):
+        """请求取消（可在任意线程中调用）"""
+        self._event.set()
+
+    def check(self):
+        """已取消时抛出OperationCancelled"""
+        if self._event.is_set():
+            raise OperationCancelled()
+
+
+class TreeWalker:
+    """基于显式scandir栈的单遍目录遍历器
+
+    每个目录只读取一次，逐条产出os.DirEntry（保留其缓存的d_type和stat结果），
+    并在遍历过程中统计文件数和文件夹数。
+    """
+
+    def __init__(self, folder_path, include_subfolders=True, cancel_token=None):
+        self.folder_path = folder_path
+        self.include_subfolders = include_subfolders
+        self.cancel_token = cancel_token
+        self.file_count = 0  # 文件计数
+        self.dir_count = 0  # 文件夹计数
+        self.error_count = 0  # 无法读取的目录数
+
+    def __iter__(self):
+        cancelled = self.cancel_token.is_cancelled if self.cancel_token is not None else lambda: False
+        stack = [self.folder_path]
+        while stack:
+            current = stack.pop()
+            try:
+                it = os.scandir(current)
+            except OSError:
+                # 无权限或目录已被删除，跳过该目录
+                self.error_count += 1
+                continue
+            subdirs = []
+            with it:
+                for entry in it:
+                    if cancelled():
+                        return
+                    try:
+                        # 不跟随符号链接递归，避免循环
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        self.dir_count += 1
+                        if self.include_subfolders:
+                            subdirs.append(entry.path)
+                    elif entry.is_file():
+                        self.file_count += 1
+                    yield entry
+            # 逆序入栈，保证与os.walk(topdown=True)相同的先序遍历顺序
+            stack.extend(reversed(subdirs))
+
+
+class ScannedEntry:
+    """ParallelTreeWalker产出的条目，提供遍历和ScanResult.add_entry用到的os.DirEntry接口
+
+    工作线程读取目录后只保留(名称, 是否为目录, stat结果)，不保存DirEntry对象；
+    完整路径在消费者取用时才拼接。
+    """
+
+    __slots__ = ("name", "path", "_is_dir", "_stat")
+
+    def __init__(self, path, name, is_dir, st):
+        self.path = path
+        self.name = name
+        self._is_dir = is_dir  # 不跟随符号链接的判断结果
+        self._stat = st  # 跟随符号链接的stat结果，失败时为None
+
+    def is_dir(self, follow_symlinks=True):
+        if not follow_symlinks:
+            return self._is_dir
+        return self._stat is not None and stat.S_ISDIR(self._stat.st_mode)
+
+    def is_file(self, follow_symlinks=True):
+        return self._stat is not None and stat.S_ISREG(self._stat.st_mode)
+
+    def stat(self, follow_symlinks=True):
+        if self._stat is None:
+            raise FileNotFoundError(f"无法读取文件信息: {self.path}")
+        return self._stat
+
+
+class ParallelTreeWalker:
+    """并行目录遍历器，适用于NFS/SMB等readdir延迟较高的文件系统
+
+    待读取的目录按先序遍历的位置（子目录序号组成的元组）放入优先队列，由固定数量的线程并发读取，
+    总是先读取消费者最先需要的目录；产出顺序与TreeWalker完全一致（先序遍历），结果可确定地合并。
+    已读取但尚未被消费的目录最多max_pending个，消费者停顿时工作线程随之等待，
+    内存占用与目录树大小无关（消费者正在等待的目录不受此限制，保证不会互相等待）。
+    """
+
+    def __init__(self, folder_path, include_subfolders=True, workers=4, cancel_token=None, max_pending=256):
+        self.folder_path = folder_path
+        self.include_subfolders = include_subfolders
+        self.workers = max(1, int(workers))
+        self.cancel_token = cancel_token
+        self.max_pending = max(1, int(max_pending))
+        self.file_count = 0
+        self.dir_count = 0
+        self.error_count = 0
+
+    @staticmethod
+    def _read_dir(path):
+        """读取单个目录，返回(名称, 是否为目录, stat结果)的列表；读取失败时返回None"""
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        # 在工作线程中完成类型判断和stat，消费者调用ScanResult.add_entry时不再产生系统调用
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                    entries.append((entry.name, is_dir, st))
+        except OSError:
+            return None
+        return entries
+
+    def _worker(self, state):
+        cond = state["cond"]
+        pending = state["pending"]
+        results = state["results"]
+        while True:
+            with cond:
+                # 已读取未消费的目录达到上限时等待，除非队首正是消费者在等的目录
+                while not state["stop"] and not (
+                        pending and (state["in_flight"] + len(results) < self.max_pending
+                                     or pending[0][0] == state["needed"])):
+                    cond.wait()
+                if state["stop"]:
+                    return
+                key, path = heappop(pending)
+                state["in_flight"] += 1
+            entries = self._read_dir(path)
+            with cond:
+                state["in_flight"] -= 1
+                results[path] = entries
+                if entries is not None and self.include_subfolders:
+                    position = 0
+                    for name, is_dir, _ in entries:
+                        if is_dir:
+                            heappush(pending, (key + (position,), os.path.join(path, name)))
+                            position += 1
+                cond.notify_all()
+
+    def __iter__(self):
+        if self.workers == 1 or not self.include_subfolders:
+            # 单线程或非递归时并行没有意义，退化为串行遍历
+            walker = TreeWalker(self.folder_path, self.include_subfolders, self.cancel_token)
+            try:
+                yield from walker
+            finally:
+                self.file_count = walker.file_count
+                self.dir_count = walker.dir_count
+                self.error_count = walker.error_count
+            return
+
+        cond = threading.Condition()
+        state = {
+            "cond": cond,
+            "pending": [((), self.folder_path)],  # 待读取目录的堆：(先序位置, 路径)
+            "results": {},  # 已读取未消费的目录：路径 -> 条目列表
+            "in_flight": 0,  # 正在读取的目录数
+            "needed": (),  # 消费者正在等待的目录的先序位置
+            "stop": False,
+        }
+        results = state["results"]
+        threads = [threading.Thread(target=self._worker, args=(state,), daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        cancelled = self.cancel_token.is_cancelled if self.cancel_token is not None else lambda: False
+
+        try:
+            # 按先序遍历顺序等待各目录结果，保证输出顺序确定
+            stack = [((), self.folder_path)]
+            while stack:
+                key, current = stack.pop()
+                with cond:
+                    state["needed"] = key
+                    cond.notify_all()
+                    while current not in results:
+                        # 定时醒来检查取消，避免在慢速共享上一直等待
+                        cond.wait(0.05)
+                        if cancelled():
+                            return
+                    entries = results.pop(current)
+                    cond.notify_all()  # 空出一个名额
+                if entries is None:
+                    self.error_count += 1
+                    continue
+                subdirs = []
+                for name, is_dir, st in entries:
+                    if cancelled():
+                        return
+                    entry = ScannedEntry(os.path.join(current, name), name, is_dir, st)
+                    if is_dir:
+                        self.dir_count += 1
+                        subdirs.append((key + (len(subdirs),), entry.path))
+                    elif entry.is_file():
+                        self.file_count += 1
+                    yield entry
+                stack.extend(reversed(subdirs))
+        finally:
+            # 正常结束或被提前关闭时，通知所有工作线程退出
+            with cond:
+                state["stop"] = True
+                cond.notify_all()
+
+
+def make_walker(folder_path, include_subfolders=True, workers=1, cancel_token=None):
+    """根据线程数选择串行或并行遍历器"""
+    if workers and workers > 1 and include_subfolders:
+        return ParallelTreeWalker(folder_path, include_subfolders, workers, cancel_token)
+    return TreeWalker(folder_path, include_subfolders, cancel_token)
+
+
+class ScanResult:
+    """列式存储的扫描结果
+
+    每个条目只保存数组列：大小、创建时间、修改时间（整秒，array('q')）、类型标记、
+    所在文件夹编号（文件夹相对路径只保存一次）以及UTF-8编码的名称，
+    每个条目约占40~60字节，完整路径在需要时再拼接。
+    """
+
+    _NAME_ENCODING = ("utf-8", "surrogatepass")  # 兼容Windows孤立代理项和Linux不可解码文件名
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.sizes = array("q")
+        self.ctimes = array("q")
+        self.mtimes = array("q")
+        self.kinds = array("b")
+        self.parents = array("i")  # 所在文件夹编号，对应self.folders
+        self._names = bytearray()
+        self._name_offsets = array("Q", [0])
+        self.folders = [""]  # 文件夹相对路径，0号为扫描根目录
+        self.folder_parents = array("i", [-1])  # 文件夹编号 -> 父文件夹编号（子文件夹的编号总是大于父文件夹）
+        self.folder_entries = array("q", [-1])  # 文件夹编号 -> 该文件夹自身的条目下标（递增）
+        # 文件夹编号 -> 其直接条目的下标区间[起点, 终点)：扫描时同一目录的条目是连续追加的；
+        # 之后（实时监控中）不再连续追加的条目记在_late_children中
+        self._child_starts = array("q", [-1])
+        self._child_ends = array("q", [-1])
+        self._late_children = {}
+        # 目录绝对路径前缀 -> 文件夹编号，仅在扫描期间使用
+        self._dir_prefixes = {os.path.join(folder_path, ""): 0}
+        self._child_names = {}  # 文件夹编号 -> {名称: 下标}，只为实时监控中收到事件的文件夹建立
+        self.lock = threading.RLock()  # 实时监控线程修改结果时持有
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def add(self, parent_id, name, kind, size, ctime, mtime):
+        """追加一个条目，返回其下标；文件夹条目同时登记文件夹编号"""
+        index = len(self.kinds)
+        if kind == KIND_DIR:
+            # 其下条目通过绝对路径前缀找到所属文件夹
+            relative_path = os.path.join(self.folders[parent_id], name)
+            self._dir_prefixes[os.path.join(self.folder_path, relative_path, "")] = len(self.folders)
+            self.folders.append(relative_path)
+            self.folder_parents.append(parent_id)
+            self.folder_entries.append(index)
+            self._child_starts.append(-1)
+            self._child_ends.append(-1)
+        end = self._child_ends[parent_id]
+        if end == index:
+            self._child_ends[parent_id] = index + 1
+        elif end < 0:
+            self._child_starts[parent_id] = index
+            self._child_ends[parent_id] = index + 1
+        else:
+            self._late_children.setdefault(parent_id, []).append(index)
+        self.sizes.append(size)
+        self.ctimes.append(ctime)
+        self.mtimes.append(mtime)
+        self.kinds.append(kind)
+        self.parents.append(parent_id)
+        self._names += name.encode(*self._NAME_ENCODING)
+        self._name_offsets.append(len(self._names))
+        names = self._child_names.get(parent_id)
+        if names is not None:
+            names[name] = index
+        return index
+
+    def add_entry(self, entry):
+        """对DirEntry执行一次stat（跟随符号链接，与os.path.isfile/getsize一致）并追加到结果中"""
+        parent_id = self._dir_prefixes[entry.path[:len(entry.path) - len(entry.name)]]
+        try:
+            st = entry.stat()
+        except OSError:
+            return self.add(parent_id, entry.name, KIND_OTHER, 0, 0, 0)
+        return self.add(parent_id, entry.name, *self._stat_columns(st))
+
+    @staticmethod
+    def _stat_columns(st):
+        """由stat结果得到(类型, 大小, 创建时间, 修改时间)"""
+        if stat.S_ISREG(st.st_mode):
+            kind = KIND_FILE
+        elif stat.S_ISDIR(st.st_mode):
+            kind = KIND_DIR
+        else:
+            kind = KIND_OTHER
+        # 向下取整到秒，与time.localtime(浮点时间戳)的取整方式一致
+        return kind, st.st_size, st.st_ctime_ns // 1_000_000_000, st.st_mtime_ns // 1_000_000_000
+
+    def update_stat(self, i, st):
+        """用新的stat结果更新条目（类型不变时）"""
+        kind, self.sizes[i], self.ctimes[i], self.mtimes[i] = self._stat_columns(st)
+        if kind != KIND_DIR and self.kinds[i] != KIND_DIR:
+            self.kinds[i] = kind
+
+    def children(self, folder_id):
+        """文件夹的直接条目下标（含已删除的条目）"""
+        start = self._child_starts[folder_id]
+        late = self._late_children.get(folder_id, [])
+        if start < 0:
+            return late
+        return chain(range(start, self._child_ends[folder_id]), late)
+
+    def entry_folder(self, i):
+        """文件夹条目i对应的文件夹编号（folder_entries递增，二分查找）"""
+        return bisect_left(self.folder_entries, i)
+
+    def lookup(self, parent_id, name):
+        """按(文件夹编号, 名称)查找条目下标；每个文件夹在首次查找时才建立自己的名称索引"""
+        names = self._child_names.get(parent_id)
+        if names is None:
+            kinds = self.kinds
+            names = self._child_names[parent_id] = {self.name(i): i for i in self.children(parent_id)
+                                                    if kinds[i] != KIND_DELETED}
+        return names.get(name)
+
+    def remove(self, i):
+        """将条目标记为已删除；文件夹会连同其所有子孙条目一起删除，只访问被删除的子树
+
+        返回(被删除的下标列表, 被删除的文件夹编号集合)。
+        """
+        kinds = self.kinds
+        removed = [i]
+        folder_ids = set()
+        if kinds[i] == KIND_DIR:
+            stack = [self.entry_folder(i)]
+            while stack:
+                folder_id = stack.pop()
+                folder_ids.add(folder_id)
+                self._child_names.pop(folder_id, None)
+                for j in self.children(folder_id):
+                    if kinds[j] != KIND_DELETED:
+                        removed.append(j)
+                        if kinds[j] == KIND_DIR:
+                            stack.append(self.entry_folder(j))
+        names = self._child_names.get(self.parents[i])
+        if names is not None and names.get(self.name(i)) == i:
+            del names[self.name(i)]
+        for j in removed:
+            kinds[j] = KIND_DELETED
+        return removed, folder_ids
+
+    def folder_id(self, dir_path):
+        """扫描期间由目录绝对路径查找文件夹编号"""
+        return self._dir_prefixes[os.path.join(dir_path, "")]
+
+    def finish(self):
+        """扫描结束后释放仅扫描期间需要的索引"""
+        self._dir_prefixes = {}
+
+    def name(self, i):
+        """条目名称"""
+        return self._names[self._name_offsets[i]:self._name_offsets[i + 1]].decode(*self._NAME_ENCODING)
+
+    def path(self, i):
+        """条目的完整路径"""
+        return os.path.join(self.folder_path, self.folders[self.parents[i]], self.name(i))
+
+    def sorted_indices(self):
+        """按完整路径排序后的条目下标（array('i')），与按相对路径字符串排序的结果相同
+
+        同一文件夹下的路径共享前缀，某个子文件夹下的全部路径在排序结果中也是连续的一段，
+        因此逐个文件夹排序：直接条目按名称、子文件夹整体按“名称/”参与排序，再深度优先展开。
+        不为每个条目拼接完整路径，临时的名称字符串只存在于正在展开的各级文件夹中。
+        """
+        with self.lock:
+            kinds = self.kinds
+            folder_entries = self.folder_entries
+            members = [array("i") for _ in self.folders]  # 文件夹编号 -> 其中未删除的条目
+            for i, (parent, kind) in enumerate(zip(self.parents, kinds)):
+                if kind != KIND_DELETED:
+                    members[parent].append(i)
+            subfolders = [[] for _ in self.folders]  # 文件夹编号 -> 未删除的子文件夹编号
+            for folder_id in range(1, len(self.folders)):
+                if kinds[folder_entries[folder_id]] != KIND_DELETED:
+                    subfolders[self.folder_parents[folder_id]].append(folder_id)
+            name = self.name
+            separator = os.sep
+
+            def folder_items(folder_id):
+                # (排序键, 条目下标, 子文件夹编号)：条目的子文件夹编号为-1，子文件夹的条目下标为-1
+                items = [(name(i), i, -1) for i in members[folder_id]]
+                items.extend((name(folder_entries[sub]) + separator, -1, sub) for sub in subfolders[folder_id])
+                items.sort()
+                members[folder_id] = None
+                return iter(items)
+
+            order = array("i")
+            stack = [folder_items(0)]
+            while stack:
+                for _, i, folder_id in stack[-1]:
+                    if folder_id < 0:
+                        order.append(i)
+                    else:
+                        stack.append(folder_items(folder_id))
+                        break
+                else:
+                    stack.pop()
+            return order
+
+
+# 默认的扫描索引数据库位置
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".file2excel", "scan_index.sqlite3")
+
+
+class ScanIndex:
+    """基于sqlite3的持久化扫描索引，保存每个目录的条目及目录自身的mtime
+
+    路径和名称按UTF-8（surrogatepass）编码为BLOB保存，兼容无法解码的文件名。
+    """
+
+    _ENCODING = ("utf-8", "surrogatepass")
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        import sqlite3  # 仅在启用缓存时加载
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                id INTEGER PRIMARY KEY,
+                path BLOB NOT NULL UNIQUE,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                dir_id INTEGER NOT NULL,
+                name BLOB NOT NULL,
+                kind INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                ctime INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                walk INTEGER NOT NULL,
+                PRIMARY KEY (dir_id, name)
+            ) WITHOUT ROWID;
+        """)
+
+    @classmethod
+    def _key(cls, path):
+        return os.path.normcase(os.path.abspath(path)).encode(*cls._ENCODING)
+
+    def lookup_dir(self, path):
+        """返回(目录编号, 缓存的mtime_ns)，未缓存时返回None"""
+        return self.conn.execute("SELECT id, mtime_ns FROM dirs WHERE path = ?", (self._key(path),)).fetchone()
+
+    def cached_entries(self, dir_id):
+        """返回目录下缓存的条目(name, kind, size, ctime, mtime, walk)，walk表示需要递归的真实子目录"""
+        rows = self.conn.execute(
+            "SELECT name, kind, size, ctime, mtime, walk FROM entries WHERE dir_id = ?", (dir_id,)).fetchall()
+        return [(name.decode(*self._ENCODING),) + tuple(rest) for name, *rest in rows]
+
+    def store_dir(self, path, mtime_ns, rows):
+        """用新读取的条目替换目录的缓存，并清理已被删除的子目录树"""
+        key = self._key(path)
+        cached = self.lookup_dir(path)
+        if cached is None:
+            dir_id = self.conn.execute("INSERT INTO dirs (path, mtime_ns) VALUES (?, ?)", (key, mtime_ns)).lastrowid
+        else:
+            dir_id = cached[0]
+            new_subdirs = {row[0] for row in rows if row[5]}
+            for (name,) in self.conn.execute("SELECT name FROM entries WHERE dir_id = ? AND walk = 1", (dir_id,)).fetchall():
+                name = name.decode(*self._ENCODING)
+                if name not in new_subdirs:
+                    self.forget_tree(os.path.join(path, name))
+            self.conn.execute("DELETE FROM entries WHERE dir_id = ?", (dir_id,))
+            self.conn.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, dir_id))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries (dir_id, name, kind, size, ctime, mtime, walk) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(dir_id, row[0].encode(*self._ENCODING)) + tuple(row[1:]) for row in rows])
+
+    def forget_tree(self, path):
+        """删除某个目录及其所有子目录的缓存"""
+        key = self._key(path)
+        prefix = key + os.sep.encode()
+        # BLOB按字节比较，前缀范围查询即可找到整棵子树
+        ids = self.conn.execute("SELECT id FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                                (key, prefix, prefix + b"\xff")).fetchall()
+        self.conn.executemany("DELETE FROM entries WHERE dir_id = ?", ids)
+        self.conn.executemany("DELETE FROM dirs WHERE id = ?", ids)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class IndexedTreeWalker:
+    """基于ScanIndex的增量扫描
+
+    只重新读取mtime发生变化的目录，其余目录直接复用缓存的条目，
+    每个未变化的目录只需一次stat。注意：目录mtime只反映条目的增删和改名，
+    文件内容被原地修改时其大小和时间不会刷新。
+    """
+
+    def __init__(self, folder_path, include_subfolders=True, index=None, cancel_token=None):
+        self.folder_path = folder_path
+        self.include_subfolders = include_subfolders
+        self.index = index
+        self.cancel_token = cancel_token
+        self.error_count = 0
+        self.reused_dirs = 0  # 复用缓存的目录数
+        self.read_dirs = 0  # 重新读取的目录数
+
+    def scan_into(self, result):
+        """把目录树扫描进result，每处理一个条目产出一次，调用方可随时中止"""
+        cancelled = self.cancel_token.is_cancelled if self.cancel_token is not None else lambda: False
+        try:
+            root_mtime = os.stat(self.folder_path).st_mtime_ns
+        except OSError:
+            self.error_count += 1
+            return
+        stack = [(self.folder_path, root_mtime)]
+        while stack:
+            path, mtime_ns = stack.pop()
+            subdirs = []
+            cached = self.index.lookup_dir(path)
+            if cached is not None and cached[1] == mtime_ns:
+                # 目录未变化：复用缓存条目，只需stat子目录以判断其是否变化
+                self.reused_dirs += 1
+                parent_id = result.folder_id(path)
+                for name, kind, size, ctime, mtime, walk in self.index.cached_entries(cached[0]):
+                    if cancelled():
+                        return
+                    result.add(parent_id, name, kind, size, ctime, mtime)
+                    if walk and self.include_subfolders:
+                        subdir = os.path.join(path, name)
+                        try:
+                            subdirs.append((subdir, os.stat(subdir, follow_symlinks=False).st_mtime_ns))
+                        except OSError:
+                            self.error_count += 1
+                    yield
+            else:
+                self.read_dirs += 1
+                try:
+                    with os.scandir(path) as it:
+                        entries = list(it)
+                except OSError:
+                    self.error_count += 1
+                    continue
+                rows = []
+                for entry in entries:
+                    if cancelled():
+                        return  # 该目录不写入缓存
+                    i = result.add_entry(entry)
+                    try:
+                        walk = entry.is_dir(follow_symlinks=False) and result.kinds[i] == KIND_DIR
+                    except OSError:
+                        walk = False
+                    rows.append((entry.name, result.kinds[i], result.sizes[i], result.ctimes[i], result.mtimes[i], int(walk)))
+                    if walk and self.include_subfolders:
+                        # 真实目录的stat结果已缓存在DirEntry中，不产生额外系统调用
+                        subdirs.append((entry.path, entry.stat().st_mtime_ns))
+                    yield
+                # 目录完整读取后才写入缓存，中途停止不会留下不完整的记录
+                self.index.store_dir(path, mtime_ns, rows)
+            stack.extend(reversed(subdirs))
+
+
+def iter_scan(result, include_subfolders=True, workers=1, index=None, cancel_token=None):
+    """把result.folder_path扫描进result，每处理一个条目产出一次
+
+    index不为None时使用增量扫描（串行）；否则按workers选择串行或并行遍历。
+    cancel_token被取消时提前结束，已扫描的条目保留在result中。
+    """
+    if index is not None:
+        walker = IndexedTreeWalker(result.folder_path, include_subfolders, index, cancel_token)
+        try:
+            yield from walker.scan_into(result)
+        finally:
+            index.commit()
+        return
+    for entry in make_walker(result.folder_path, include_subfolders, workers, cancel_token):
+        result.add_entry(entry)
+        yield
+
+
+class TreeWatcher:
+    """基于inotify的目录树实时监控（通过ctypes调用，无额外依赖，仅支持Linux）
+
+    扫描完成后为结果中的每个文件夹登记监控，把新增、删除、修改和移动增量应用到ScanResult，
+    并通过on_change(动作, 下标)通知调用方；动作为"add"、"remove"、"modify"或"overflow"
+    （内核事件队列溢出，需要重新扫描）。ScanResult只为收到事件的文件夹建立名称索引。
+    start()要为每个文件夹登记监控，大目录树上耗时较长，应在工作线程中调用。
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_EXCL_UNLINK = 0x04000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                  | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, result, include_subfolders=True, on_change=None):
+        if not sys.platform.startswith("linux"):
+            raise OSError("实时监控仅支持Linux（inotify）")
+        import ctypes  # 仅在启用实时监控时加载
+        self._ctypes = ctypes
+        self.result = result
+        self.include_subfolders = include_subfolders
+        self.on_change = on_change
+        self.watch_errors = 0  # 登记失败的目录数（通常是超过fs.inotify.max_user_watches）
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = -1
+        self._watches = {}  # wd -> 文件夹编号
+        self._folder_watches = {}  # 文件夹编号 -> wd
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """登记监控并启动事件线程"""
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            errno = self._ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        with self.result.lock:
+            folder_count = len(self.result.folders) if self.include_subfolders else 1
+            for folder_id in range(folder_count):
+                self._add_watch(folder_id)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监控并关闭inotify句柄"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _folder_path(self, folder_id):
+        return os.path.join(self.result.folder_path, self.result.folders[folder_id])
+
+    def _add_watch(self, folder_id):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(self._folder_path(folder_id)), self.WATCH_MASK)
+        if wd < 0:
+            self.watch_errors += 1
+            return
+        self._watches[wd] = folder_id
+        self._folder_watches[folder_id] = wd
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([self._fd], [], [], 0.2)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = self._EVENT_HEADER.unpack_from(data, offset)
+                offset += self._EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                with self.result.lock:
+                    self._handle(wd, mask, name)
+
+    def _notify(self, action, index):
+        if self.on_change is not None:
+            self.on_change(action, index)
+
+    def _handle(self, wd, mask, name):
+        if mask & self.IN_Q_OVERFLOW:
+            self._notify("overflow", -1)
+            return
+        if mask & self.IN_IGNORED:
+            folder_id = self._watches.pop(wd, None)
+            self._folder_watches.pop(folder_id, None)
+            return
+        parent_id = self._watches.get(wd)
+        if parent_id is None or not name:
+            return
+        result = self.result
+        index = result.lookup(parent_id, name)
+        if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+            if index is not None:
+                removed, folder_ids = result.remove(index)
+                for folder_id in folder_ids:
+                    # 移出监控范围的文件夹需要手动移除监控，已删除的文件夹由内核自动移除
+                    old_wd = self._folder_watches.pop(folder_id, None)
+                    if old_wd is not None:
+                        self._watches.pop(old_wd, None)
+                        self._libc.inotify_rm_watch(self._fd, old_wd)
+                for removed_index in removed:
+                    self._notify("remove", removed_index)
+            return
+        path = os.path.join(self._folder_path(parent_id), name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return  # 事件到达前条目已被删除，后续的删除事件会处理
+        if index is not None:
+            # 已存在的条目（含覆盖式移动）：刷新stat结果
+            result.update_stat(index, st)
+            self._notify("modify", index)
+            return
+        if not mask & (self.IN_CREATE | self.IN_MOVED_TO):
+            return
+        index = result.add(parent_id, name, *result._stat_columns(st))
+        self._notify("add", index)
+        if result.kinds[index] == KIND_DIR and self.include_subfolders and not os.path.islink(path):
+            # 先登记监控再扫描子树，避免遗漏扫描期间新建的条目
+            self._add_watch(len(result.folders) - 1)
+            for entry in TreeWalker(path, True):
+                added = result.add_entry(entry)
+                if result.kinds[added] == KIND_DIR and not entry.is_symlink():
+                    self._add_watch(len(result.folders) - 1)
+                self._notify("add", added)
+
+
+def startup_elapsed():
+    """进程启动至今的秒数，用于测量启动耗时；无法获取进程创建时间时从导入本模块开始计时"""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+        creation, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+        kernel32 = ctypes.windll.kernel32
+        if kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(creation), ctypes.byref(exited),
+                                    ctypes.byref(kernel), ctypes.byref(user)):
+            # FILETIME为自1601-01-01起的100纳秒数
+            created = ((creation.dwHighDateTime << 32) | creation.dwLowDateTime) / 1e7 - 11644473600
+            return time.time() - created
+    elif sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/stat") as f:
+                start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime") as f:
+                uptime = float(f.read().split()[0])
+            return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            pass
+    return time.perf_counter() - _IMPORT_TIME
+
+
+def convert_size(size_bytes):
+    """转换文件大小为KB, MB, GB, TB等"""
+    if size_bytes == 0:
+        return "0B"
+    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+    i = int(math.floor(math.log(size_bytes, 1024)))
+    p = math.pow(1024, i)
+    s = round(size_bytes / p, 2)
+    return f"{s} {size_name[i]}"
+
+
+def format_time(timestamp):
+    """格式化时间戳为本地时间字符串"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+BYTES_SUFFIX = "（字节）"  # 原始数值模式下大小列表头的后缀
+_SIZE_POWERS = tuple(math.pow(1024, i) for i in range(len(SIZE_UNITS)))
+
+
+def _log_unit_thresholds():
+    """math.log(n, 1024)取整结果首次达到k的最小整数n（k从1开始）
+
+    浮点误差使略小于1024**k的大整数（约从1024**5起）也被取整为k，
+    与bit_length得到的单位不同；按math.log二分出每个边界，快速路径据此保持原有结果。
+    """
+    thresholds = [0]
+    for k in range(1, len(SIZE_UNITS) + 1):
+        low, high = 1024 ** (k - 1), 1024 ** k
+        while low < high:
+            middle = (low + high) // 2
+            if int(math.floor(math.log(middle, 1024))) >= k:
+                high = middle
+            else:
+                low = middle + 1
+        thresholds.append(low)
+    return tuple(thresholds)
+
+
+_SIZE_UNIT_THRESHOLDS = _log_unit_thresholds()
+
+
+class RowFormatter:
+    """导出行中文件大小和时间的格式化，结果与convert_size、format_time逐字节相同
+
+    文件大小用整数bit_length选择单位，小于1KB的直接查表，重复出现的大小走缓存；
+    时间按本地日期缓存“年-月-日”部分，同一天内的时间戳只做整数运算，
+    当天UTC偏移不固定（夏令时切换日等）时退回time.strftime。一个实例只应在一个线程中使用。
+    """
+
+    CACHE_LIMIT = 1 << 16  # 大小和日期缓存的条目上限，超出后清空重建
+
+    def __init__(self):
+        self._small_sizes = ["0B"] + [f"{float(n)} B" for n in range(1, 1024)]
+        self._sizes = {}
+        self._days = {}  # 本地日期编号 -> (当天0点的时间戳, "年-月-日 ")
+        self._offsets = []  # 已缓存日期的UTC偏移（秒）
+        self._clocks = {}  # 当天秒数 -> "时:分:秒"
+
+    def size(self, size_bytes):
+        """同convert_size"""
+        if 0 <= size_bytes < 1024:
+            return self._small_sizes[size_bytes]
+        text = self._sizes.get(size_bytes)
+        if text is None:
+            i = (size_bytes.bit_length() - 1) // 10
+            if i < len(SIZE_UNITS) and size_bytes >= _SIZE_UNIT_THRESHOLDS[i + 1]:
+                i += 1
+            if i >= len(SIZE_UNITS) or size_bytes < 0:
+                return convert_size(size_bytes)  # 超出单位范围或为负数时由原函数报错
+            text = f"{round(size_bytes / _SIZE_POWERS[i], 2)} {SIZE_UNITS[i]}"
+            if len(self._sizes) >= self.CACHE_LIMIT:
+                self._sizes.clear()
+            self._sizes[size_bytes] = text
+        return text
+
+    def time(self, timestamp):
+        """同format_time，timestamp为整数秒"""
+        for offset in self._offsets:
+            day = self._days.get((timestamp + offset) // 86400)
+            if day is not None:
+                seconds = timestamp - day[0]
+                if 0 <= seconds < 86400:
+                    clock = self._clocks.get(seconds)
+                    if clock is None:
+                        hours, rest = divmod(seconds, 3600)
+                        clock = self._clocks[seconds] = "%02d:%02d:%02d" % (hours, *divmod(rest, 60))
+                    return day[1] + clock
+        return self._time_uncached(timestamp)
+
+    def _time_uncached(self, timestamp):
+        local = time.localtime(timestamp)
+        text = time.strftime("%Y-%m-%d %H:%M:%S", local)
+        start = timestamp - (local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec)
+        try:
+            first, last = time.localtime(start), time.localtime(start + 86399)
+        except (OverflowError, OSError, ValueError):
+            return text
+        # 只缓存从0点起连续86400秒偏移不变的日期
+        if (first.tm_hour, first.tm_min, first.tm_sec, last.tm_hour, last.tm_min, last.tm_sec) == (0, 0, 0, 23, 59, 59) \
+                and first.tm_gmtoff == last.tm_gmtoff == local.tm_gmtoff:
+            offset = local.tm_gmtoff
+            if len(self._days) >= self.CACHE_LIMIT:
+                self._days.clear()
+            self._days[(start + offset) // 86400] = (start, text[:-8])
+            if offset not in self._offsets:
+                self._offsets.append(offset)
+        return text
+
+    @staticmethod
+    def datetimes(values):
+        """批量转换为本地时间的datetime（原始数值模式）"""
+        from_timestamp = datetime.fromtimestamp
+        return [from_timestamp(value) for value in values]
+
+    def sizes(self, values):
+        """批量格式化文件大小"""
+        size = self.size
+        return [size(value) for value in values]
+
+    def times(self, values):
+        """批量格式化时间戳"""
+        time_ = self.time
+        return [time_(value) for value in values]
+
+
+def export_headers(export_options):
+    """根据导出选项生成表头"""
+    headers = ["序号", "文件夹", "文件名"]
+    if export_options["size"]:
+        headers.append("文件大小（字节）" if export_options.get("typed") else "文件大小")
+    if export_options["ctime"]:
+        headers.append("创建时间")
+    if export_options["mtime"]:
+        headers.append("修改时间")
+    if export_options["ext"]:
+        headers.append("文件类型")
+    if export_options["path"]:
+        headers.append("文件路径")
+    return headers
+
+
+class QuantileSketch:
+    """文件大小的近似分位数（DDSketch式对数分桶）
+
+    大小为v的文件计入编号ceil(log_gamma(v))的桶，gamma = (1 + α) / (1 - α)，
+    同一桶内的值与桶的代表值相差不超过相对误差α。桶编号只取决于数值范围：
+    α为1%时64位整数的全部范围不到2200个桶，内存与文件数无关；
+    两个草图的同号桶计数直接相加即可合并，合并结果与一次统计全部文件相同。
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._inverse_log_gamma = 1 / math.log(self.gamma)
+        self.buckets = defaultdict(int)  # 桶编号 -> 文件数
+        self.zero_count = 0  # 大小为0的文件单独计数
+        self.count = 0
+
+    def add(self, size):
+        self.update((size,))
+
+    def update(self, sizes):
+        """计入一批文件大小"""
+        buckets = self.buckets
+        inverse_log_gamma = self._inverse_log_gamma
+        log = math.log
+        ceil = math.ceil
+        count = 0
+        zero_count = 0
+        for size in sizes:
+            count += 1
+            if size > 0:
+                buckets[ceil(log(size) * inverse_log_gamma)] += 1
+            else:
+                zero_count += 1
+        self.count += count
+        self.zero_count += zero_count
+
+    def merge(self, other):
+        """把另一个相同精度的草图并入本草图"""
+        if other.gamma != self.gamma:
+            raise ValueError("只能合并相对误差相同的分位数草图")
+        for key, count in other.buckets.items():
+            self.buckets[key] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """第q分位数（0 <= q <= 1）的近似值，没有数据时返回None
+
+        返回整数字节数，除相对误差α外另有不超过0.5字节的取整误差。
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0
+        seen = self.zero_count
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # 桶(gamma^(key-1), gamma^key]的代表值，与区间内任意值的相对误差不超过α
+                return round(2 * self.gamma ** key / (self.gamma + 1))
+
+
+class ExtensionStats:
+    """按文件类型累计的总大小、大小分布、修改时间分布和大小分位数
+
+    与导出在同一遍中逐批统计，每种类型只保存固定数量的计数和一个QuantileSketch，
+    内存与文件数无关。
+    """
+
+    # 大小分布的上界（不含）：4 KB、64 KB、1 MB、16 MB、256 MB、4 GB，之后为“4 GB以上”
+    SIZE_BUCKETS = ("4 KB以下", "4 KB-64 KB", "64 KB-1 MB", "1 MB-16 MB", "16 MB-256 MB", "256 MB-4 GB", "4 GB以上")
+    # 修改时间距导出时刻的天数上界（不含）
+    AGE_LIMITS = (7, 30, 180, 365, 3 * 365)
+    AGE_BUCKETS = ("7天内", "7-30天", "30-180天", "180天-1年", "1-3年", "3年以上")
+    QUANTILES = ((0.5, "P50"), (0.9, "P90"), (0.99, "P99"))
+    NO_EXTENSION = "（无扩展名）"
+    TOTAL_LABEL = "（全部）"
+
+    def __init__(self, now=None):
+        self.now = time.time() if now is None else now
+        self._age_limits = [days * 86400 for days in self.AGE_LIMITS]
+        # bit_length -> 大小分布的档位，每4位为一档：小于2**12为第0档，2**12到2**16为第1档……
+        self._size_buckets = [min(max(bits - 9, 0) // 4, len(self.SIZE_BUCKETS) - 1) for bits in range(65)]
+        self._types = {}  # 文件类型 -> [文件数, 总大小, 大小分布, 修改时间分布, QuantileSketch]
+
+    def add(self, file_exts, files):
+        """统计一批文件，file_exts为扩展名，files为对应的(文件夹相对路径, 名称, 类型, 大小, 创建时间, 修改时间)"""
+        types = self._types
+        now = self.now
+        age_limits = self._age_limits
+        size_buckets = self._size_buckets
+        batch_sizes = {}  # 文件类型 -> 本批文件大小，按类型成批计入分位数草图
+        for file_ext, entry in zip(file_exts, files):
+            stats = types.get(file_ext)
+            if stats is None:
+                stats = types[file_ext] = [0, 0, [0] * len(self.SIZE_BUCKETS), [0] * len(self.AGE_BUCKETS),
+                                           QuantileSketch()]
+            size = entry[3]
+            stats[0] += 1
+            stats[1] += size
+            stats[2][size_buckets[size.bit_length()]] += 1
+            stats[3][bisect_right(age_limits, now - entry[5])] += 1
+            sizes = batch_sizes.get(file_ext)
+            if sizes is None:
+                sizes = batch_sizes[file_ext] = []
+            sizes.append(size)
+        for file_ext, sizes in batch_sizes.items():
+            types[file_ext][4].update(sizes)
+
+    def headers(self, typed=False):
+        unit = "（字节）" if typed else ""
+        return (["文件类型", "文件数", f"总大小{unit}", *(f"{label}{unit}" for _, label in self.QUANTILES)]
+                + [f"大小{label}" for label in self.SIZE_BUCKETS] + [f"修改于{label}" for label in self.AGE_BUCKETS])
+
+    def rows(self, typed=False):
+        """每种类型一行，按总大小从大到小排列，最后一行为所有类型合并后的合计"""
+        total = [0, 0, [0] * len(self.SIZE_BUCKETS), [0] * len(self.AGE_BUCKETS), QuantileSketch()]
+        rows = []
+        for file_ext, stats in sorted(self._types.items(), key=lambda item: item[1][1], reverse=True):
+            rows.append(self._row(file_ext or self.NO_EXTENSION, stats, typed))
+            total[0] += stats[0]
+            total[1] += stats[1]
+            total[2] = [a + b for a, b in zip(total[2], stats[2])]
+            total[3] = [a + b for a, b in zip(total[3], stats[3])]
+            total[4].merge(stats[4])
+        rows.append(self._row(self.TOTAL_LABEL, total, typed))
+        return rows
+
+    def _row(self, label, stats, typed):
+        count, total_size, size_buckets, age_buckets, sketch = stats
+        sizes = [total_size] + [sketch.quantile(q) or 0 for q, _ in self.QUANTILES]
+        if not typed:
+            sizes = [convert_size(size) for size in sizes]
+        return [label, count, *sizes, *size_buckets, *age_buckets]
+
+
+class ExportSummary:
+    """导出过程中累计的统计信息
+
+    extension_stats为True时同时按文件类型统计大小和修改时间的分布（ExtensionStats）。
+    """
+
+    def __init__(self, extension_stats=False):
+        self.total_size = 0
+        self.file_count = 0
+        self.folder_count = 0
+        self.file_type_counts = defaultdict(int)
+        self.extension_stats = ExtensionStats() if extension_stats else None
+
+    def rows(self, raw=False):
+        """生成统计信息行（不含标题行）；raw为True时总大小为字节数（项目名为“文件夹总大小（字节）”）"""
+        rows = [
+            ["文件总数", self.file_count],
+            ["文件夹总数", self.folder_count],
+            ["文件夹总大小（字节）", self.total_size] if raw else ["文件夹总大小", convert_size(self.total_size)],
+        ]
+        for file_type, count in self.file_type_counts.items():
+            rows.append([f"{file_type} 文件数量", count])
+        return rows
+
+
+def build_rows(index, folder_path, entries, export_options, summary, formatter=None, folder_sizes=False):
+    """由一批条目生成行数据并累计统计信息，返回(行列表, 类型列表)；无需导出的条目（非文件/文件夹）跳过
+
+    entries为(文件夹相对路径, 名称, 类型, 大小, 创建时间, 修改时间)，行序号从index开始；
+    大小和时间按列批量格式化，formatter（RowFormatter）可在多批之间复用以保留缓存。
+    export_options["typed"]为True时不做格式化：大小为字节数（整数），时间为datetime，
+    Excel中写成带数字格式的日期时间单元格，可直接排序、求和；
+    export_options["raw"]为True时大小为字节数、时间为时间戳（整数秒），供raw_values输出（SqliteSink）使用。
+    folder_sizes为True时文件夹条目的“大小”为汇总后的总大小（FolderRollup），写入文件夹行的“文件大小”列。
+    """
+    if formatter is None:
+        formatter = RowFormatter()
+    files = [entry for entry in entries if entry[2] == KIND_FILE]
+    raw = export_options.get("raw")
+    typed = raw or export_options.get("typed")
+    format_times = list if raw else formatter.datetimes if typed else formatter.times
+    with_ext = export_options["ext"]
+    with_path = export_options["path"]
+    folder_size = None
+    if folder_sizes and export_options["size"]:
+        folder_size = (lambda size: size) if typed else formatter.size
+    columns = []
+    if export_options["size"]:
+        sizes = [entry[3] for entry in files]
+        columns.append(sizes if typed else formatter.sizes(sizes))
+    if export_options["ctime"]:
+        columns.append(format_times([entry[4] for entry in files]))
+    if export_options["mtime"]:
+        columns.append(format_times([entry[5] for entry in files]))
+    columns = list(zip(*columns)) if columns else None
+
+    rows = []
+    kinds = []
+    file_types = summary.file_type_counts
+    extension_stats = summary.extension_stats
+    file_exts = []  # 各文件的扩展名，按类型统计时使用
+    position = 0  # 当前文件在files中的位置
+    for folder, name, kind, size, ctime, mtime in entries:
+        if kind == KIND_FILE:
+            file_ext = os.path.splitext(name)[1]  # 获取文件扩展名
+            row = [index, folder, name]  # 顶级文件不显示文件夹
+            if columns is not None:
+                row.extend(columns[position])
+            if with_ext:
+                row.append(file_ext)
+            if with_path:
+                row.append(os.path.join(folder_path, folder, name))
+            file_types[file_ext] += 1
+            if extension_stats is not None:
+                file_exts.append(file_ext)
+            position += 1
+        elif kind == KIND_DIR:
+            summary.folder_count += 1
+            row = [index, os.path.join(folder, name), ""]
+            if folder_size is not None:
+                row.append(folder_size(size))
+        else:
+            continue
+        rows.append(row)
+        kinds.append(kind)
+        index += 1
+    summary.total_size += sum(entry[3] for entry in files)
+    summary.file_count += len(files)
+    if extension_stats is not None:
+        extension_stats.add(file_exts, files)
+    return rows, kinds
+
+
+class FolderRollup:
+    """每个文件夹（含全部子孙）的总大小、文件数和子文件夹数，线性时间计算
+
+    先把每个条目计入其所在文件夹，再按文件夹编号从大到小把每个文件夹的合计加到父文件夹上：
+    子文件夹总在父文件夹之后登记、编号更大，逆序遍历即为自底向上，每个文件夹只累加一次，
+    总耗时为O(条目数 + 文件夹数)，与目录深度无关。
+    """
+
+    ROOT_LABEL = "（根目录）"  # “文件夹汇总”表中扫描根目录的名称
+
+    def __init__(self, result):
+        self.result = result
+        with result.lock:
+            count = len(result.folders)
+            zeros = bytes(8 * count)
+            sizes, files, subfolders = array("q", zeros), array("q", zeros), array("q", zeros)
+            for parent, kind, size in zip(result.parents, result.kinds, result.sizes):
+                if kind == KIND_FILE:
+                    sizes[parent] += size
+                    files[parent] += 1
+                elif kind == KIND_DIR:
+                    subfolders[parent] += 1
+            folder_parents = result.folder_parents
+            for folder_id in range(count - 1, 0, -1):
+                parent = folder_parents[folder_id]
+                sizes[parent] += sizes[folder_id]
+                files[parent] += files[folder_id]
+                subfolders[parent] += subfolders[folder_id]
+            # 文件夹条目下标 -> 文件夹编号，导出文件夹行时查找
+            self.folder_ids = {entry: folder_id for folder_id, entry in enumerate(result.folder_entries) if folder_id}
+        self.sizes = sizes
+        self.files = files
+        self.subfolders = subfolders
+
+    def entry_size(self, i):
+        """文件夹条目i的总大小"""
+        return self.sizes[self.folder_ids[i]]
+
+    @staticmethod
+    def headers(typed=False):
+        return ["文件夹", "总大小（字节）" if typed else "总大小", "文件数", "子文件夹数"]
+
+    def rows(self, typed=False, formatter=None):
+        """“文件夹汇总”表的行，按文件夹路径排序（与主表顺序一致），已删除的文件夹不输出"""
+        result = self.result
+        kinds = result.kinds
+        folders = result.folders
+        folder_ids = [folder_id for folder_id, entry in enumerate(result.folder_entries)
+                      if folder_id == 0 or kinds[entry] != KIND_DELETED]
+        folder_ids.sort(key=folders.__getitem__)
+        if typed:
+            sizes = [self.sizes[folder_id] for folder_id in folder_ids]
+        else:
+            sizes = (formatter or RowFormatter()).sizes([self.sizes[folder_id] for folder_id in folder_ids])
+        return [[folders[folder_id] or self.ROOT_LABEL, size, self.files[folder_id], self.subfolders[folder_id]]
+                for folder_id, size in zip(folder_ids, sizes)]
+
+
+DEFAULT_TOP_K = 100  # 排行报告默认列出的条目数
+
+
+def top_report_size(export_options):
+    """排行报告的条目数，未启用排行报告时为0"""
+    if not export_options.get("top"):
+        return 0
+    return export_options.get("top_k") or DEFAULT_TOP_K
+
+
+class TopReport:
+    """导出时顺带统计的排行：最大的文件、最大的文件夹（需文件夹汇总）和最久未修改的文件
+
+    每个排行是容量为k的小根堆，堆顶为当前入选者中最小的一个，新条目只需与堆顶比较一次，
+    只有更大时才替换堆顶（O(log k)），内存与条目总数无关，导出结束时堆中即为前k名。
+    """
+
+    SHEETS = (("top_files", "最大文件"), ("top_folders", "最大文件夹"), ("oldest_files", "最久未修改文件"))
+
+    def __init__(self, folder_path, k=DEFAULT_TOP_K, folders=False):
+        self.folder_path = folder_path
+        self.k = k
+        self.folders = folders  # 文件夹条目的大小为汇总后的总大小（FolderRollup）时才统计最大文件夹
+        self._largest = []
+        self._largest_folders = []
+        self._oldest = []  # 以负的修改时间为键，越早越靠前
+
+    def add(self, entries):
+        """统计一批(文件夹相对路径, 名称, 类型, 大小, 创建时间, 修改时间)条目"""
+        k = self.k
+        largest = self._largest
+        largest_folders = self._largest_folders
+        oldest = self._oldest
+        with_folders = self.folders
+        for entry in entries:
+            kind = entry[2]
+            if kind == KIND_FILE:
+                size = entry[3]
+                if len(largest) < k:
+                    heappush(largest, (size, entry))
+                elif size > largest[0][0]:
+                    heappushpop(largest, (size, entry))
+                age = -entry[5]
+                if len(oldest) < k:
+                    heappush(oldest, (age, entry))
+                elif age > oldest[0][0]:
+                    heappushpop(oldest, (age, entry))
+            elif kind == KIND_DIR and with_folders:
+                size = entry[3]
+                if len(largest_folders) < k:
+                    heappush(largest_folders, (size, entry))
+                elif size > largest_folders[0][0]:
+                    heappushpop(largest_folders, (size, entry))
+
+    def sheets(self, typed=False, formatter=None, raw=False):
+        """返回[(表名, 标题, 表头, 行)]，每个排行按从大到小（从旧到新）排列
+
+        raw为True时大小为字节数、修改时间为时间戳（整数秒），表头同原始数值模式。
+        """
+        formatter = formatter or RowFormatter()
+        typed = typed or raw
+        heaps = (self._largest, self._largest_folders, self._oldest)
+        sheets = []
+        for (name, title), heap in zip(self.SHEETS, heaps):
+            if heap is self._largest_folders and not self.folders:
+                continue
+            entries = [entry for _, entry in sorted(heap, reverse=True)]
+            sizes = [entry[3] for entry in entries]
+            mtimes = [entry[5] for entry in entries]
+            if not typed:
+                sizes = formatter.sizes(sizes)
+                mtimes = formatter.times(mtimes)
+            elif not raw:
+                mtimes = formatter.datetimes(mtimes)
+            if heap is self._largest_folders:
+                headers = ["排名", "文件夹路径", "总大小（字节）" if typed else "总大小", "修改时间"]
+            else:
+                headers = ["排名", "文件路径", "文件大小（字节）" if typed else "文件大小", "修改时间"]
+            rows = [[rank, os.path.join(self.folder_path, entry[0], entry[1]), size, mtime]
+                    for rank, (entry, size, mtime) in enumerate(zip(entries, sizes, mtimes), 1)]
+            sheets.append((name, title, headers, rows))
+        return sheets
+
+
+RESTAT_WORKERS = 16  # 导出前重新读取文件信息时的线程数；网络共享上stat的耗时主要是往返延迟，线程数可远大于CPU核数
+
+
+def prefetch_stats(paths, workers=RESTAT_WORKERS, window=None):
+    """在线程池中并发stat，按输入顺序逐个产出stat结果（失败时为None）
+
+    最多有window个（默认为线程数的8倍）请求在途，调用方处理当前结果时后续请求已在进行，
+    高延迟文件系统上的吞吐量随线程数增长，而不再受单次往返延迟限制。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def stat_or_none(path):
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    window = window or workers * 8
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="restat")
+    pending = deque()
+    try:
+        for path in paths:
+            pending.append(pool.submit(stat_or_none, path))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # 提前结束（取消或出错）时丢弃尚未开始的请求
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_export_batches(result, export_options, summary, restat_workers=0, batch_size=1000, rollup=None, top=None,
+                        raw_options=None):
+    """按路径排序遍历扫描结果，每batch_size个条目产出一次(已处理条目数, 行列表, 类型列表, 原始数值行列表)，
+    同时累计统计信息
+
+    默认只使用扫描时记录的stat结果，不产生任何文件系统调用；restat_workers大于0时，
+    用该数量的线程预先重新stat每个条目并更新扫描结果（已不存在的条目不再导出），
+    适合使用缓存索引或扫描后间隔较久的情况。
+    rollup（FolderRollup）不为None时文件夹行写出该文件夹的总大小（按汇总时的大小，不受重新读取影响）。
+    top（TopReport）不为None时每批条目同时计入排行。
+    raw_options（见raw_row_options）不为None时另外按该选项生成原始数值的行，否则产出的原始数值行为None。
+    """
+    index = 1  # 序号从1开始
+    formatter = RowFormatter()
+    raw_summary = ExportSummary()  # 原始数值的行不重复计入统计信息
+    kinds = result.kinds
+    folders = result.folders
+    parents = result.parents
+    sizes, ctimes, mtimes = result.sizes, result.ctimes, result.mtimes
+    indices = result.sorted_indices()
+    stats = prefetch_stats(map(result.path, indices), restat_workers) if restat_workers > 0 else None
+    for start in range(0, len(indices), batch_size):
+        entries = []
+        for i in indices[start:start + batch_size]:
+            if stats is not None:
+                st = next(stats)
+                if st is None:
+                    continue
+                result.update_stat(i, st)
+            kind = kinds[i]
+            size = rollup.entry_size(i) if rollup is not None and kind == KIND_DIR else sizes[i]
+            entries.append((folders[parents[i]], result.name(i), kind, size, ctimes[i], mtimes[i]))
+        if top is not None:
+            top.add(entries)
+        rows, row_kinds = build_rows(index, result.folder_path, entries, export_options, summary, formatter,
+                                     rollup is not None)
+        raw_rows = None
+        if raw_options is not None:
+            raw_rows = build_rows(index, result.folder_path, entries, raw_options, raw_summary, formatter,
+                                  rollup is not None)[0]
+        index += len(rows)
+        yield min(start + batch_size, len(indices)), rows, row_kinds, raw_rows
+
+
+def default_output_path(folder_path, extension):
+    """导出文件默认保存在扫描目录下，以文件夹名称（盘符根目录时为盘符）命名"""
+    folder_path = os.path.normpath(folder_path)
+    drive, tail = os.path.splitdrive(folder_path)
+    # 判断是否为盘符根目录（兼容不同分隔符）
+    if os.path.isdir(folder_path) and drive and tail in ('\\', '/'):
+        folder_name = drive.rstrip(':')
+    else:
+        folder_name = os.path.basename(folder_path)
+    return os.path.join(folder_path, f"{folder_name}{extension}")
+
+
+PARTIAL_SUFFIX = ".part"  # 写出过程中的临时文件后缀
+
+
+class CsvSink:
+    """CSV输出（UTF-8 BOM，Excel可直接打开）"""
+
+    extension = ".csv"
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._writer = None
+
+    def open(self, headers):
+        self._file = open(self.path + PARTIAL_SUFFIX, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(headers)
+
+    def write_rows(self, rows, kinds=None):
+        self._writer.writerows(rows)
+
+    def write_summary(self, rows):
+        self._writer.writerow([])  # 空行用于分隔
+        self._writer.writerow(["统计信息"])
+        self._writer.writerows(rows)
+
+    def write_sheet(self, name, title, headers, rows):
+        """额外的数据表（文件夹汇总等）：与统计信息一样以空行分隔，追加在文件末尾"""
+        self._writer.writerow([])
+        self._writer.writerow([title])
+        self._writer.writerow(headers)
+        self.write_rows(rows)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.replace(self.path + PARTIAL_SUFFIX, self.path)
+
+    def abort(self):
+        """放弃输出并删除临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self.path + PARTIAL_SUFFIX)
+
+
+CSV_COMPRESSIONS = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}  # 压缩格式 -> 追加在.csv之后的扩展名
+DEFAULT_COMPRESS_LEVELS = {"gzip": 6, "bz2": 9, "xz": 6}  # 与gzip、bzip2、xz命令行工具的默认级别相同
+
+
+class CompressedCsvSink(CsvSink):
+    """压缩的CSV输出（gzip/bz2/xz，使用标准库），内容与CsvSink解压后完全相同
+
+    行先写入内存缓冲区，每满chunk_size字节编码一次，经有界队列交给后台线程压缩写盘；
+    zlib、bz2、lzma压缩时释放GIL，压缩与行格式化同时进行，写盘的数据量只有原来的几分之一。
+    level为压缩级别（gzip/bz2为1-9，xz为0-9），None时使用DEFAULT_COMPRESS_LEVELS。
+    """
+
+    extension = ".csv.gz"
+    chunk_size = 1 << 20
+
+    def __init__(self, path, compression="gzip", level=None):
+        if compression not in CSV_COMPRESSIONS:
+            raise ValueError(f"未知的压缩格式: {compression}")
+        super().__init__(path)
+        self.compression = compression
+        self.level = DEFAULT_COMPRESS_LEVELS[compression] if level is None else level
+        self._buffer = None
+        self._chunks = None
+        self._thread = None
+        self._error = None
+
+    @staticmethod
+    def extension_for(compression):
+        """压缩后的完整扩展名，如.csv.gz"""
+        return CsvSink.extension + CSV_COMPRESSIONS[compression]
+
+    def open(self, headers):
+        self._buffer = io.StringIO(newline="")
+        self._buffer.write("\ufeff")  # 与utf-8-sig相同的BOM，Excel据此识别编码
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(headers)
+        self._chunks = queue.Queue(maxsize=8)  # 压缩跟不上时格式化线程在put上等待，内存占用有上限
+        self._error = None
+        self._thread = threading.Thread(target=self._compress, args=(self.path + PARTIAL_SUFFIX,),
+                                        name="csv-compress", daemon=True)
+        self._thread.start()
+
+    def _open_compressed(self, raw):
+        if self.compression == "gzip":
+            import gzip
+            # 文件头中记录最终的文件名，而不是临时文件名
+            return gzip.GzipFile(os.path.basename(self.path), "wb", self.level, raw)
+        if self.compression == "bz2":
+            import bz2
+            return bz2.BZ2File(raw, "wb", compresslevel=self.level)
+        import lzma
+        return lzma.LZMAFile(raw, "wb", preset=self.level)
+
+    def _compress(self, part_path):
+        """后台线程：压缩并写出队列中的数据块，直到收到None"""
+        finished = False
+        try:
+            with open(part_path, "wb") as raw, self._open_compressed(raw) as compressed:
+                while True:
+                    chunk = self._chunks.get()
+                    if chunk is None:
+                        finished = True
+                        break
+                    compressed.write(chunk)
+        except BaseException as e:
+            self._error = e
+            # 出错后继续取走数据块，避免写出线程阻塞在put上
+            while not finished:
+                finished = self._chunks.get() is None
+
+    def _put_chunk(self):
+        if self._error is not None:
+            raise self._error
+        data = self._buffer.getvalue()
+        if data:
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            self._chunks.put(data.encode("utf-8"))
+
+    def write_rows(self, rows, kinds=None):
+        self._writer.writerows(rows)
+        if self._buffer.tell() >= self.chunk_size:
+            self._put_chunk()
+
+    def _stop(self):
+        """通知压缩线程结束并等待其写完"""
+        self._chunks.put(None)
+        self._thread.join()
+        self._thread = None
+        self._buffer = None
+
+    def close(self):
+        if self._thread is not None:
+            try:
+                self._put_chunk()
+            except BaseException:
+                self.abort()
+                raise
+            self._stop()
+            if self._error is not None:
+                if os.path.exists(self.path + PARTIAL_SUFFIX):
+                    os.remove(self.path + PARTIAL_SUFFIX)
+                raise self._error
+            os.replace(self.path + PARTIAL_SUFFIX, self.path)
+
+    def abort(self):
+        """放弃输出并删除临时文件"""
+        if self._thread is not None:
+            self._stop()
+            if os.path.exists(self.path + PARTIAL_SUFFIX):
+                os.remove(self.path + PARTIAL_SUFFIX)
+
+
+EXCEL_MAX_ROWS = 1048576  # Excel单个工作表的最大行数（含表头）
+EXCEL_DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"  # 原始数值模式下日期时间单元格的数字格式，显示效果与文本时间相同
+
+
+def numbered_path(path, number):
+    """分册工作簿的文件名：第1册即path本身，之后为“名称_2.xlsx”、“名称_3.xlsx”……"""
+    if number == 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}_{number}{extension}"
+
+
+class ExcelSinkBase:
+    """Excel输出的公共部分：写满一个工作表（EXCEL_MAX_ROWS行）后自动换到下一个
+
+    rollover为"sheet"时换到同一工作簿的Sheet2…N，为"workbook"时换到编号工作簿（名称_2.xlsx…），
+    每个工作表都重复表头；统计信息和额外的数据表单独写在最后一个工作簿的工作表中。
+    子类实现_open_workbook/_open_sheet/_write_header/_append_rows/_write_summary_sheet/_close_workbook/_discard_workbook。
+    """
+
+    extension = ".xlsx"
+    max_rows = EXCEL_MAX_ROWS
+
+    def __init__(self, path, rollover="sheet"):
+        if rollover not in ("sheet", "workbook"):
+            raise ValueError(f"未知的换表方式: {rollover}")
+        self.path = path
+        self.rollover = rollover
+        self.paths = []  # 已写出（或正在写出）的全部工作簿路径
+        self._headers = None
+        self._sheet_number = 0
+        self._sheet_rows = 0  # 当前工作表已写入的行数（含表头）
+
+    def open(self, headers):
+        self._headers = headers
+        self._next_workbook()
+
+    def _next_workbook(self):
+        self.paths.append(numbered_path(self.path, len(self.paths) + 1))
+        self._open_workbook(self.paths[-1] + PARTIAL_SUFFIX)
+        self._sheet_number = 0
+        self._next_sheet()
+
+    def _next_sheet(self):
+        self._sheet_number += 1
+        self._open_sheet("Sheet" if self._sheet_number == 1 else f"Sheet{self._sheet_number}")
+        self._write_header(self._headers)
+        self._sheet_rows = 1
+
+    def write_rows(self, rows, kinds=None):
+        start = 0
+        total = len(rows)
+        while start < total:
+            if self._sheet_rows >= self.max_rows:
+                if self.rollover == "workbook":
+                    self._close_workbook()
+                    self._next_workbook()
+                else:
+                    self._next_sheet()
+            end = min(total, start + self.max_rows - self._sheet_rows)
+            if start == 0 and end == total:
+                self._append_rows(rows, kinds)  # 绝大多数批次不跨表，不复制列表
+            else:
+                self._append_rows(rows[start:end], None if kinds is None else kinds[start:end])
+            self._sheet_rows += end - start
+            start = end
+
+    def write_summary(self, rows):
+        self._open_sheet("统计信息")
+        self._write_summary_sheet(rows)
+
+    def write_sheet(self, name, title, headers, rows):
+        """额外的数据表（文件夹汇总等）写在最后一个工作簿的单独工作表中，超过行数上限时续写到“标题2”……"""
+        limit = self.max_rows - 1  # 每个工作表都有表头
+        for number, start in enumerate(range(0, max(len(rows), 1), limit), 1):
+            self._open_sheet(title if number == 1 else f"{title}{number}")
+            self._write_header(headers)
+            self._append_rows(rows[start:start + limit], None)
+
+    def close(self):
+        if self.paths and self._headers is not None:
+            self._close_workbook()
+            self._headers = None
+            for path in self.paths:
+                os.replace(path + PARTIAL_SUFFIX, path)
+
+    def abort(self):
+        """放弃输出并删除所有临时文件（包括已写完的分册）"""
+        if self.paths and self._headers is not None:
+            self._discard_workbook()
+            self._headers = None
+            for path in self.paths:
+                if os.path.exists(path + PARTIAL_SUFFIX):
+                    os.remove(path + PARTIAL_SUFFIX)
+
+
+class ExcelSink(ExcelSinkBase):
+    """Excel输出（openpyxl只写模式，内存占用不随行数增长）"""
+
+    def __init__(self, path, rollover="sheet"):
+        super().__init__(path, rollover)
+        self._workbook = None
+        self._sheet = None
+        self._part_path = None
+        self._time_columns = ()  # 时间列的下标，原始数值模式下这些列为datetime
+
+    def _open_workbook(self, part_path):
+        import openpyxl
+        self._workbook = openpyxl.Workbook(write_only=True)
+        self._part_path = part_path
+
+    def _open_sheet(self, title):
+        self._sheet = self._workbook.create_sheet(title)
+
+    def _write_header(self, headers):
+        self._time_columns = [column for column, header in enumerate(headers) if header in ("创建时间", "修改时间")]
+        self._sheet.append(headers)
+
+    def _append_rows(self, rows, kinds):
+        sheet = self._sheet
+        time_columns = self._time_columns
+        for row in rows:
+            if time_columns and len(row) > time_columns[0] and type(row[time_columns[0]]) is datetime:
+                row = list(row)  # 同一行可能还要写入其他输出，不修改原列表
+                for column in time_columns:
+                    row[column] = self._datetime_cell(row[column])
+            sheet.append(row)
+
+    def _datetime_cell(self, value):
+        from openpyxl.cell import WriteOnlyCell
+
+        cell = WriteOnlyCell(self._sheet, value)
+        cell.number_format = EXCEL_DATETIME_FORMAT
+        return cell
+
+    def _write_summary_sheet(self, rows):
+        self._sheet.append(["统计信息"])
+        for row in rows:
+            self._sheet.append(row)
+
+    def _close_workbook(self):
+        self._workbook.save(self._part_path)
+        self._workbook = None
+
+    def _discard_workbook(self):
+        # 结束只写工作表的临时文件，不生成xlsx
+        for sheet in self._workbook.worksheets:
+            if not sheet.closed:
+                sheet.close()
+        self._workbook = None
+
+
+def excel_named_styles():
+    """带样式导出使用的命名样式（与界面版导出的外观一致），返回openpyxl.styles.NamedStyle列表"""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    light_fill = PatternFill(start_color="F5F7FA", end_color="F5F7FA", fill_type="solid")
+    left = Alignment(horizontal="left", vertical="center")
+    normal_font = Font(name="微软雅黑", size=10)
+    bold_font = Font(name="微软雅黑", size=10, bold=True)
+    return [
+        NamedStyle("表头", font=Font(name="微软雅黑", size=11, bold=True, color="FFFFFF"),
+                   fill=PatternFill(start_color="4A6FA5", end_color="4A6FA5", fill_type="solid"),
+                   alignment=Alignment(horizontal="center", vertical="center"), border=border),
+        NamedStyle("文件行", font=normal_font, border=border),
+        NamedStyle("文件行（交替）", font=normal_font, border=border, fill=light_fill),
+        NamedStyle("文件行（日期）", font=normal_font, border=border, number_format=EXCEL_DATETIME_FORMAT),
+        NamedStyle("文件行（日期，交替）", font=normal_font, border=border, fill=light_fill,
+                   number_format=EXCEL_DATETIME_FORMAT),
+        NamedStyle("文件夹行", font=bold_font, border=border,
+                   fill=PatternFill(start_color="E3E9F2", end_color="E3E9F2", fill_type="solid")),
+        NamedStyle("统计标题", font=Font(name="微软雅黑", size=12, bold=True, color="FFFFFF"),
+                   fill=PatternFill(start_color="6E9CD1", end_color="6E9CD1", fill_type="solid"),
+                   alignment=Alignment(horizontal="center", vertical="center"), border=border),
+        NamedStyle("统计数据", font=normal_font, border=border, alignment=left),
+        NamedStyle("统计数据（交替）", font=normal_font, border=border, alignment=left, fill=light_fill),
+        NamedStyle("类型统计", font=bold_font, border=border, alignment=left),
+        NamedStyle("类型统计（交替）", font=bold_font, border=border, alignment=left, fill=light_fill),
+    ]
+
+
+class StyledExcelSink(ExcelSink):
+    """带样式的Excel输出（openpyxl只写模式 + 命名样式）
+
+    表头、隔行底色、文件夹行和统计信息的样式在工作簿中只注册一次，
+    每个单元格只引用已注册的样式，不再逐个创建Font/Fill，内存占用不随行数增长。
+    """
+
+    COLUMN_WIDTHS = {"文件名": 30, "文件路径": 50, "创建时间": 20, "修改时间": 20}  # 其余列为15
+    SUMMARY_WIDTHS = (20, 15)  # “统计信息”工作表A、B两列的列宽
+    DATETIME_STYLES = {"文件行": "文件行（日期）", "文件行（交替）": "文件行（日期，交替）"}  # datetime单元格改用带数字格式的样式
+
+    def __init__(self, path, rollover="sheet"):
+        super().__init__(path, rollover)
+        self._styles = {}  # 样式名称 -> 样式数组（注册后、首次使用前为None）
+        self._width = 0
+        self._row_number = 0
+
+    def _open_workbook(self, part_path):
+        super()._open_workbook(part_path)
+        from openpyxl.cell import WriteOnlyCell
+
+        self._new_cell = WriteOnlyCell
+        self._styles = {}
+        for style in excel_named_styles():
+            self._workbook.add_named_style(style)
+            self._styles[style.name] = None
+
+    def _open_sheet(self, title):
+        super()._open_sheet(title)
+        self._row_number = 0
+        for name, style_array in self._styles.items():
+            if style_array is None:
+                # 按名称赋值样式需要在样式列表中查找，每个工作簿只做一次，之后直接复用解析好的样式数组
+                template = self._new_cell(self._sheet)
+                template.style = name
+                self._styles[name] = template._style
+
+    def _set_widths(self, widths):
+        # 列宽必须在写入第一行之前设置
+        from openpyxl.utils import get_column_letter
+
+        for column, width in enumerate(widths, 1):
+            self._sheet.column_dimensions[get_column_letter(column)].width = width
+
+    def _write_header(self, headers):
+        self._set_widths([self.COLUMN_WIDTHS.get(header, 15) for header in headers])
+        self._width = len(headers)
+        self._append(headers, "表头")
+
+    def _append(self, values, style, width=0):
+        """以指定样式写入一行；width大于值的个数时用空单元格补齐（同样带样式）"""
+        style_array = self._styles[style]
+        cells = []
+        for value in values:
+            cell = self._new_cell(self._sheet, value)
+            if type(value) is datetime:
+                cell._style = self._styles[self.DATETIME_STYLES.get(style, style)]
+            else:
+                cell._style = style_array  # 只写模式下单元格写出后即丢弃，可安全共享同一样式数组
+            cells.append(cell)
+        for _ in range(len(values), width):
+            cell = self._new_cell(self._sheet)
+            cell._style = style_array
+            cells.append(cell)
+        self._sheet.append(cells)
+        self._row_number += 1
+
+    def _append_rows(self, rows, kinds):
+        if kinds is None:
+            kinds = [KIND_FILE] * len(rows)
+        for row, kind in zip(rows, kinds):
+            if kind == KIND_DIR:
+                # 文件夹行的样式覆盖所有列，即使超出了实际数据的列数
+                self._append(row, "文件夹行", self._width)
+            else:
+                self._append(row, "文件行（交替）" if self._row_number % 2 == 1 else "文件行")
+
+    def _write_summary_sheet(self, rows):
+        """rows为ExportSummary.rows()：前3行为总体统计，其后为各类型文件数量"""
+        self._set_widths(self.SUMMARY_WIDTHS)
+        self._append(["统计信息"], "统计标题", 2)
+        self._sheet.merged_cells.add("A1:B1")
+        for idx, row in enumerate(rows[:3]):
+            self._append(row, "统计数据（交替）" if idx % 2 == 0 else "统计数据", 2)
+        for idx, row in enumerate(rows[3:]):
+            self._append(row, "类型统计（交替）" if idx % 2 == 0 else "类型统计", 2)
+
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_SPREADSHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_RELATIONSHIP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")  # XML 1.0不允许的字符，写出时删除
+
+# 内置引擎的固定样式表，与excel_named_styles()的外观一致；cellXfs的下标即单元格的s属性
+NATIVE_STYLE_IDS = {name: i for i, name in enumerate(
+    ("表头", "文件行", "文件行（交替）", "文件夹行", "统计标题", "统计数据", "统计数据（交替）", "类型统计", "类型统计（交替）",
+     "日期", "文件行（日期）", "文件行（日期，交替）"), 1)}
+# datetime单元格的样式：行样式下标 -> 同一外观加上日期时间数字格式的样式下标
+_NATIVE_DATETIME_STYLES = {0: NATIVE_STYLE_IDS["日期"],
+                           NATIVE_STYLE_IDS["文件行"]: NATIVE_STYLE_IDS["文件行（日期）"],
+                           NATIVE_STYLE_IDS["文件行（交替）"]: NATIVE_STYLE_IDS["文件行（日期，交替）"]}
+_EXCEL_EPOCH = datetime(1899, 12, 30)  # Excel日期序列号的起点（1900日期系统）
+_NATIVE_STYLES_XML = (
+    _XML_DECLARATION + f'<styleSheet xmlns="{_SPREADSHEET_NS}">'
+    f'<numFmts count="1"><numFmt numFmtId="164" formatCode="{EXCEL_DATETIME_FORMAT}"/></numFmts>'
+    '<fonts count="5">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><color rgb="00FFFFFF"/><name val="微软雅黑"/></font>'
+    '<font><sz val="10"/><name val="微软雅黑"/></font>'
+    '<font><b/><sz val="10"/><name val="微软雅黑"/></font>'
+    '<font><b/><sz val="12"/><color rgb="00FFFFFF"/><name val="微软雅黑"/></font>'
+    '</fonts>'
+    '<fills count="6">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="004A6FA5"/><bgColor rgb="004A6FA5"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="00F5F7FA"/><bgColor rgb="00F5F7FA"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="00E3E9F2"/><bgColor rgb="00E3E9F2"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="006E9CD1"/><bgColor rgb="006E9CD1"/></patternFill></fill>'
+    '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="13">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="2" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="2" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="2" fillId="3" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="3" fillId="4" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="4" fillId="5" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="2" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="left" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="2" fillId="3" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="left" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="3" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="left" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="3" fillId="3" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="left" vertical="center"/></xf>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="2" fillId="0" borderId="1" xfId="0" applyNumberFormat="1" applyFont="1" applyBorder="1"/>'
+    '<xf numFmtId="164" fontId="2" fillId="3" borderId="1" xfId="0" applyNumberFormat="1" applyFont="1" applyFill="1" applyBorder="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def column_letter(column):
+    """列号（从1开始）转换为Excel列名：1 -> A，27 -> AA"""
+    letters = ""
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class NativeExcelSink(ExcelSinkBase):
+    """内置的xlsx写出引擎：不经过openpyxl，把工作表XML按批直接写入zip条目
+
+    每个单元格只做一次字符串拼接，不创建单元格对象，速度约为openpyxl只写模式的十倍以上。
+    字符串默认以内联方式写出（内存占用恒定）；shared_strings为True时写入共享字符串表，
+    重复的文件夹名只保存一次，文件更小，但需要在内存中保留所有不同的字符串。
+    工作表条目启用ZIP64，超过4GB也能正确写出。
+    """
+
+    COLUMN_WIDTHS = None  # 列名 -> 列宽；None表示使用Excel默认列宽
+    SUMMARY_WIDTHS = None  # “统计信息”工作表各列的列宽
+    HEADER_STYLE = 0  # 表头的样式下标
+    compresslevel = 1  # 工作表XML重复度高，最低压缩级别已能压缩到原来的十分之一左右，且速度最快
+
+    def __init__(self, path, rollover="sheet", shared_strings=False):
+        super().__init__(path, rollover)
+        self.shared_strings = shared_strings
+        self._zip = None
+        self._stream = None
+        self._sheets = []  # 当前工作簿中的工作表名称，依次对应sheet1.xml、sheet2.xml……
+        self._letters = []  # 列下标 -> 列名
+        self._strings = {}  # 共享字符串 -> 下标
+        self._merged = []  # 当前工作表的合并单元格区域，如"A1:B1"
+        self._serials = {}  # datetime -> Excel日期序列号文本
+        self._width = 0
+        self._row_number = 0
+
+    def _open_workbook(self, part_path):
+        import zipfile
+
+        self._zip = zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel)
+        self._sheets = []
+        self._strings = {}
+
+    def _open_sheet(self, title):
+        self._end_sheet()
+        self._sheets.append(title)
+        self._stream = self._zip.open(f"xl/worksheets/sheet{len(self._sheets)}.xml", "w", force_zip64=True)
+        self._merged = []
+        self._row_number = 0
+
+    def _begin_sheet(self, widths=None):
+        """写出工作表开头；列宽必须写在sheetData之前"""
+        cols = ""
+        if widths:
+            cols = "<cols>" + "".join(f'<col min="{column}" max="{column}" width="{width}" customWidth="1"/>'
+                                      for column, width in enumerate(widths, 1)) + "</cols>"
+        self._write(f'{_XML_DECLARATION}<worksheet xmlns="{_SPREADSHEET_NS}" xmlns:r="{_RELATIONSHIP_NS}">'
+                    f'{cols}<sheetData>')
+
+    def _end_sheet(self):
+        if self._stream is not None:
+            merged = ""
+            if self._merged:
+                merged = (f'<mergeCells count="{len(self._merged)}">'
+                          + "".join(f'<mergeCell ref="{ref}"/>' for ref in self._merged) + "</mergeCells>")
+            self._write(f"</sheetData>{merged}</worksheet>")
+            self._stream.close()
+            self._stream = None
+
+    def _write_header(self, headers):
+        self._width = len(headers)
+        if self.COLUMN_WIDTHS is None:
+            self._begin_sheet()
+        else:
+            self._begin_sheet([self.COLUMN_WIDTHS.get(header, 15) for header in headers])
+        self._write(self._row_xml(headers, self.HEADER_STYLE))
+
+    def _write(self, text):
+        # 文件名中可能含有XML不允许的控制字符，整批统一删除（标签本身不含这些字符）
+        self._stream.write(_ILLEGAL_XML_CHARS.sub("", text).encode("utf-8", "replace"))
+
+    def _row_xml(self, values, style=0, width=0):
+        """生成一行的XML；style为样式表中的下标（0为默认样式），width大于值的个数时用带样式的空单元格补齐"""
+        self._row_number += 1
+        row_number = self._row_number
+        count = max(len(values), width)
+        letters = self._letters
+        while len(letters) < count:
+            letters.append(column_letter(len(letters) + 1))
+        s = f' s="{style}"' if style else ""
+        parts = [f'<row r="{row_number}">']
+        append = parts.append
+        for letter, value in zip(letters, values):
+            if type(value) is str:
+                if not value:
+                    if style:
+                        append(f'<c r="{letter}{row_number}"{s}/>')
+                    continue
+                if self.shared_strings:
+                    index = self._strings.get(value)
+                    if index is None:
+                        index = self._strings[value] = len(self._strings)
+                    append(f'<c r="{letter}{row_number}"{s} t="s"><v>{index}</v></c>')
+                    continue
+                text = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+                if value[0].isspace() or value[-1].isspace():
+                    append(f'<c r="{letter}{row_number}"{s} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+                else:
+                    append(f'<c r="{letter}{row_number}"{s} t="inlineStr"><is><t>{text}</t></is></c>')
+            elif value is None:
+                if style:
+                    append(f'<c r="{letter}{row_number}"{s}/>')
+            elif type(value) is bool:
+                append(f'<c r="{letter}{row_number}"{s} t="b"><v>{int(value)}</v></c>')
+            elif isinstance(value, (int, float)):
+                append(f'<c r="{letter}{row_number}"{s}><v>{value}</v></c>')
+            elif type(value) is datetime:
+                # 日期时间写成序列号（天数 + 当天秒数/86400），显示格式由样式中的数字格式决定；
+                # 同一批创建的文件时间相同，创建时间也常等于修改时间，序列号按值缓存
+                serial = self._serials.get(value)
+                if serial is None:
+                    if len(self._serials) >= 1 << 16:
+                        self._serials.clear()
+                    delta = value - _EXCEL_EPOCH
+                    serial = self._serials[value] = str(delta.days + delta.seconds / 86400)
+                append(f'<c r="{letter}{row_number}" s="{_NATIVE_DATETIME_STYLES.get(style, style)}"><v>{serial}</v></c>')
+            else:
+                text = str(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+                append(f'<c r="{letter}{row_number}"{s} t="inlineStr"><is><t>{text}</t></is></c>')
+        if style:
+            for letter in letters[len(values):count]:
+                append(f'<c r="{letter}{row_number}"{s}/>')
+        append("</row>")
+        return "".join(parts)
+
+    def _append_rows(self, rows, kinds):
+        row_xml = self._row_xml
+        self._write("".join([row_xml(row) for row in rows]))
+
+    def _write_summary_sheet(self, rows):
+        self._begin_sheet(self.SUMMARY_WIDTHS)
+        row_xml = self._row_xml
+        self._write(row_xml(["统计信息"]) + "".join([row_xml(row) for row in rows]))
+
+    def _write_package(self):
+        """工作表之外的固定部件：内容类型、关系、工作簿和样式表（以及共享字符串表）"""
+        zf = self._zip
+        sheet_count = len(self._sheets)
+        overrides = [("/xl/workbook.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml")]
+        overrides.extend((f"/xl/worksheets/sheet{number}.xml",
+                          "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml")
+                         for number in range(1, sheet_count + 1))
+        overrides.append(("/xl/styles.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"))
+        relationships = [(f"rId{number}", "worksheet", f"worksheets/sheet{number}.xml")
+                         for number in range(1, sheet_count + 1)]
+        relationships.append((f"rId{sheet_count + 1}", "styles", "styles.xml"))
+        if self.shared_strings:
+            overrides.append(("/xl/sharedStrings.xml",
+                              "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"))
+            relationships.append((f"rId{sheet_count + 2}", "sharedStrings", "sharedStrings.xml"))
+            count = len(self._strings)
+            with zf.open("xl/sharedStrings.xml", "w", force_zip64=True) as stream:
+                stream.write(f'{_XML_DECLARATION}<sst xmlns="{_SPREADSHEET_NS}" count="{count}" uniqueCount="{count}">'
+                             .encode("utf-8"))
+                batch = []
+                for value in self._strings:  # 字典保持插入顺序，即下标顺序
+                    text = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+                    space = ' xml:space="preserve"' if value[0].isspace() or value[-1].isspace() else ""
+                    batch.append(f"<si><t{space}>{text}</t></si>")
+                    if len(batch) >= 10000:
+                        stream.write(_ILLEGAL_XML_CHARS.sub("", "".join(batch)).encode("utf-8", "replace"))
+                        batch = []
+                stream.write((_ILLEGAL_XML_CHARS.sub("", "".join(batch)) + "</sst>").encode("utf-8", "replace"))
+        zf.writestr("[Content_Types].xml", (
+            f'{_XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            + "".join(f'<Override PartName="{name}" ContentType="{content_type}"/>' for name, content_type in overrides)
+            + "</Types>"))
+        zf.writestr("_rels/.rels", (
+            f'{_XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_RELATIONSHIP_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"))
+        zf.writestr("xl/workbook.xml", (
+            f'{_XML_DECLARATION}<workbook xmlns="{_SPREADSHEET_NS}" xmlns:r="{_RELATIONSHIP_NS}">'
+            "<sheets>" + "".join(f'<sheet name="{name}" sheetId="{number}" r:id="rId{number}"/>'
+                                 for number, name in enumerate(self._sheets, 1)) + "</sheets></workbook>"))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            f'{_XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="{rid}" Type="{_RELATIONSHIP_NS}/{kind}" Target="{target}"/>'
+                      for rid, kind, target in relationships)
+            + "</Relationships>"))
+        zf.writestr("xl/styles.xml", _NATIVE_STYLES_XML)
+
+    def _close_workbook(self):
+        self._end_sheet()
+        self._write_package()
+        self._zip.close()
+        self._zip = None
+
+    def _discard_workbook(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._zip.close()
+        self._zip = None
+
+
+class NativeStyledExcelSink(NativeExcelSink):
+    """内置引擎的带样式输出：样式表固定写在styles.xml中，外观与StyledExcelSink一致，每个单元格只写样式下标"""
+
+    COLUMN_WIDTHS = StyledExcelSink.COLUMN_WIDTHS
+    SUMMARY_WIDTHS = StyledExcelSink.SUMMARY_WIDTHS
+    HEADER_STYLE = NATIVE_STYLE_IDS["表头"]
+
+    def _append_rows(self, rows, kinds):
+        if kinds is None:
+            kinds = [KIND_FILE] * len(rows)
+        row_xml = self._row_xml
+        folder_style = NATIVE_STYLE_IDS["文件夹行"]
+        file_styles = (NATIVE_STYLE_IDS["文件行"], NATIVE_STYLE_IDS["文件行（交替）"])  # 按上一行的行号奇偶交替
+        parts = []
+        for row, kind in zip(rows, kinds):
+            if kind == KIND_DIR:
+                # 文件夹行的样式覆盖所有列，即使超出了实际数据的列数
+                parts.append(row_xml(row, folder_style, self._width))
+            else:
+                parts.append(row_xml(row, file_styles[self._row_number % 2]))
+        self._write("".join(parts))
+
+    def _write_summary_sheet(self, rows):
+        """rows为ExportSummary.rows()：前3行为总体统计，其后为各类型文件数量"""
+        self._begin_sheet(self.SUMMARY_WIDTHS)
+        parts = [self._row_xml(["统计信息"], NATIVE_STYLE_IDS["统计标题"], 2)]
+        self._merged.append("A1:B1")
+        for idx, row in enumerate(rows[:3]):
+            parts.append(self._row_xml(row, NATIVE_STYLE_IDS["统计数据（交替）" if idx % 2 == 0 else "统计数据"], 2))
+        for idx, row in enumerate(rows[3:]):
+            parts.append(self._row_xml(row, NATIVE_STYLE_IDS["类型统计（交替）" if idx % 2 == 0 else "类型统计"], 2))
+        self._write("".join(parts))
+
+
+EXCEL_ENGINES = {
+    "openpyxl": (ExcelSink, StyledExcelSink),
+    "native": (NativeExcelSink, NativeStyledExcelSink),
+}
+
+
+def excel_sink_class(engine="openpyxl", styled=False):
+    """按引擎名称选择Excel输出类：openpyxl或内置引擎（native）"""
+    return EXCEL_ENGINES[engine][bool(styled)]
+
+
+def parquet_available():
+    """是否安装了pyarrow（只查找模块，不导入，界面据此决定是否提供Parquet格式）"""
+    import importlib.util
+
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class ParquetSink:
+    """Apache Parquet列式输出（需要安装pyarrow）
+
+    行按列缓存，每row_group_size行写出一个行组，内存占用与总行数无关；
+    “文件夹”和“文件类型”列重复度高，使用字典编码（读入pandas后为category类型）。
+    表结构在open时由表头确定，不依赖某一批数据（某批中全为空值的列不会被推断成其他类型）：
+    序号和“文件大小（字节）”为int64，typed为True（原始数值模式）时创建/修改时间为不带时区的本地时间，其余为字符串。
+    统计信息以JSON写入文件的键值元数据（键为file2excel.summary）；
+    额外的数据表（文件夹汇总等）写成同目录下的“名称_表名.parquet”。
+    """
+
+    extension = ".parquet"
+    DICTIONARY_COLUMNS = ("文件夹", "文件类型")
+    compression = "zstd"
+
+    def __init__(self, path, row_group_size=128 * 1024, typed=False):
+        self.path = path
+        self.paths = [path]  # 主文件和额外数据表的文件
+        self.row_group_size = row_group_size
+        self.typed = typed
+        self._headers = None
+        self._columns = None  # 每列尚未写出的值
+        self._buffered = 0
+        self._schema = None
+        self._writer = None
+        self._summary = None
+
+    def open(self, headers):
+        try:
+            import pyarrow
+        except ImportError:
+            raise RuntimeError("导出Parquet格式需要安装pyarrow（pip install pyarrow）") from None
+        self._headers = list(headers)
+        self._columns = [[] for _ in headers]
+        self._buffered = 0
+        self._schema = pyarrow.schema([(header, self._header_type(header)) for header in self._headers])
+        self._summary = None
+
+    def write_rows(self, rows, kinds=None):
+        width = len(self._headers)
+        padding = [None] * width
+        # 文件夹行的列数较少，补齐后按列转置
+        rows = [row if len(row) == width else list(row) + padding[len(row):] for row in rows]
+        for values, column in zip(zip(*rows), self._columns):
+            column.extend(values)
+        self._buffered += len(rows)
+        while self._buffered >= self.row_group_size:
+            self._flush(self.row_group_size)
+
+    def write_summary(self, rows):
+        self._summary = rows
+
+    def write_sheet(self, name, title, headers, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        root, extension = os.path.splitext(self.path)
+        path = f"{root}_{name}{extension}"
+        columns = list(zip(*rows)) or [()] * len(headers)
+        table = pa.table({header: pa.array(values, type=self._column_type(header, values))
+                          for header, values in zip(headers, columns)})
+        pq.write_table(table, path + PARTIAL_SUFFIX, compression=self.compression)
+        self.paths.append(path)
+
+    def _header_type(self, header):
+        """主表各列的类型"""
+        import pyarrow as pa
+
+        if header in self.DICTIONARY_COLUMNS:
+            return pa.dictionary(pa.int32(), pa.string())
+        if header in ("序号", "文件大小（字节）"):
+            return pa.int64()
+        if header in ("创建时间", "修改时间") and self.typed:
+            return pa.timestamp("s")
+        return pa.string()
+
+    def _column_type(self, header, values):
+        """额外数据表各列的类型（一次写出整张表，按其中的值确定）"""
+        import pyarrow as pa
+
+        if header in self.DICTIONARY_COLUMNS:
+            return pa.dictionary(pa.int32(), pa.string())
+        sample = next((value for value in values if value is not None and value != ""), None)
+        if type(sample) is int:
+            return pa.int64()
+        if type(sample) is datetime:
+            return pa.timestamp("s")
+        return pa.string()
+
+    def _flush(self, count):
+        """把缓存的前count行写成一个行组；第一次写出时创建文件"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path + PARTIAL_SUFFIX, self._schema, compression=self.compression,
+                                            use_dictionary=[name for name in self.DICTIONARY_COLUMNS
+                                                            if name in self._headers])
+        arrays = [pa.array(values[:count], type=field.type) for values, field in zip(self._columns, self._schema)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema), row_group_size=max(count, 1))
+        for values in self._columns:
+            del values[:count]
+        self._buffered -= count
+
+    def close(self):
+        if self._columns is not None:
+            import json
+
+            if self._buffered or self._writer is None:
+                self._flush(self._buffered)
+            if self._summary is not None:
+                self._writer.add_key_value_metadata(
+                    {"file2excel.summary": json.dumps(self._summary, ensure_ascii=False)})
+            self._writer.close()
+            self._writer = None
+            self._columns = None
+            for path in self.paths:
+                os.replace(path + PARTIAL_SUFFIX, path)
+
+    def abort(self):
+        """放弃输出并删除临时文件"""
+        if self._columns is not None:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._columns = None
+            for path in self.paths:
+                if os.path.exists(path + PARTIAL_SUFFIX):
+                    os.remove(path + PARTIAL_SUFFIX)
+
+
+class SqliteSink:
+    """SQLite数据库输出：文件夹和文件类型规范化到单独的表，适合对大量条目按类型、文件夹、大小筛选查询
+
+    表结构：folders(id, path)、extensions(id, extension)、
+    entries(id, folder_id, name, size, ctime, mtime, extension_id, path, is_dir)（按所选列建立）、summary(item, value)
+    以及额外的数据表（如folder_summary），列名同原始数值模式的表头；
+    视图file_list还原为与其他格式相同的列名。所有行在一个事务中用executemany批量插入，
+    size、mtime、extension_id、folder_id上的索引在全部写入后再建立。
+    所有表中的大小总是字节数、时间总是时间戳（整数秒），按数值排序和范围查询都能使用；
+    大小和时间只在视图中格式化为与其他格式相同的文本：file_list（原始数值模式下其中的大小仍为字节数），
+    以及summary_view和各数据表的“表名_view”（如folder_summary_view）。
+    """
+
+    extension = ".sqlite3"
+    raw_values = True  # 需要未格式化的行（见raw_row_options）
+    # 表头 -> entries表中的列名
+    COLUMNS = {"序号": "id", "文件夹": "folder_id", "文件名": "name", "文件大小": "size", "文件大小（字节）": "size",
+               "创建时间": "ctime", "修改时间": "mtime", "文件类型": "extension_id", "文件路径": "path"}
+    INDEXED_COLUMNS = ("size", "mtime", "extension_id", "folder_id")
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._headers = None
+        self._folder_ids = {}  # 文件夹路径 -> folders.id
+        self._extension_ids = {}  # 扩展名 -> extensions.id
+        self._sheets = []  # 额外数据表的(表名, 表头)，关闭时为其创建视图
+
+    def open(self, headers):
+        import sqlite3
+
+        part_path = self.path + PARTIAL_SUFFIX
+        if os.path.exists(part_path):
+            os.remove(part_path)  # 上次中断留下的临时库，不能在其上继续写
+        self._headers = list(headers)
+        self._folder_ids = {}
+        self._extension_ids = {}
+        self._sheets = []
+        # 临时文件写完才改名，无需日志和同步写盘；事务由write_rows之前的BEGIN和close中的COMMIT控制
+        self._conn = sqlite3.connect(part_path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        columns = [self.COLUMNS[header] for header in self._headers]
+        definitions = {"id": "id INTEGER PRIMARY KEY", "folder_id": "folder_id INTEGER NOT NULL REFERENCES folders(id)",
+                       "name": "name TEXT", "size": "size INTEGER", "ctime": "ctime INTEGER", "mtime": "mtime INTEGER",
+                       "extension_id": "extension_id INTEGER REFERENCES extensions(id)", "path": "path TEXT"}
+        self._conn.executescript(f"""
+            CREATE TABLE folders (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+            CREATE TABLE extensions (id INTEGER PRIMARY KEY, extension TEXT NOT NULL UNIQUE);
+            CREATE TABLE entries ({", ".join(definitions.get(column, column) for column in columns)}, is_dir INTEGER NOT NULL);
+            CREATE TABLE summary (item TEXT NOT NULL, value);
+            BEGIN;
+        """)
+        self._insert_entries = (f"INSERT INTO entries ({', '.join(columns)}, is_dir) "
+                                f"VALUES ({', '.join('?' * (len(columns) + 1))})")
+        self._extension_column = self._headers.index("文件类型") if "文件类型" in self._headers else None
+
+    def write_rows(self, rows, kinds=None):
+        if kinds is None:
+            kinds = [KIND_FILE] * len(rows)
+        width = len(self._headers)
+        padding = [None] * width
+        folder_ids = self._folder_ids
+        extension_ids = self._extension_ids
+        extension_column = self._extension_column
+        new_folders = []
+        new_extensions = []
+        records = []
+        for row, kind in zip(rows, kinds):
+            record = list(row) + padding[len(row):]
+            folder_id = folder_ids.get(record[1])
+            if folder_id is None:
+                folder_id = folder_ids[record[1]] = len(folder_ids) + 1
+                new_folders.append((folder_id, record[1]))
+            record[1] = folder_id
+            if extension_column is not None and record[extension_column] is not None:
+                extension_id = extension_ids.get(record[extension_column])
+                if extension_id is None:
+                    extension_id = extension_ids[record[extension_column]] = len(extension_ids) + 1
+                    new_extensions.append((extension_id, record[extension_column]))
+                record[extension_column] = extension_id
+            record.append(kind == KIND_DIR)
+            records.append(record)
+        if new_folders:
+            self._conn.executemany("INSERT INTO folders (id, path) VALUES (?, ?)", new_folders)
+        if new_extensions:
+            self._conn.executemany("INSERT INTO extensions (id, extension) VALUES (?, ?)", new_extensions)
+        self._conn.executemany(self._insert_entries, records)
+
+    def write_summary(self, rows):
+        self._conn.executemany("INSERT INTO summary (item, value) VALUES (?, ?)", rows)
+
+    def write_sheet(self, name, title, headers, rows):
+        """额外的数据表（文件夹汇总等）写成名为name的表，列名与表头相同，大小和时间列为INTEGER"""
+        columns = ", ".join(f"{self._quote(header)} INTEGER" if self._column_format(header) else self._quote(header)
+                            for header in headers)
+        self._conn.execute(f"CREATE TABLE {name} ({columns})")
+        self._conn.executemany(f"INSERT INTO {name} VALUES ({', '.join('?' * len(headers))})", rows)
+        self._sheets.append((name, list(headers)))
+
+    @staticmethod
+    def _quote(name):
+        return '"{}"'.format(name.replace('"', '""'))
+
+    @staticmethod
+    def _column_format(header):
+        """数据表的列在视图中的格式：“…（字节）”为大小，创建/修改时间为时间，其余为None（不格式化）"""
+        if header.endswith(BYTES_SUFFIX):
+            return "size"
+        if header in ("创建时间", "修改时间"):
+            return "time"
+        return None
+
+    def _create_views(self):
+        """全部写入后再建立索引（比逐行维护索引快得多），并创建与其他格式同名列的视图"""
+        columns = {self.COLUMNS[header]: header for header in self._headers}
+        for column in self.INDEXED_COLUMNS:
+            if column in columns:
+                self._conn.execute(f"CREATE INDEX entries_{column} ON entries ({column})")
+        sources = {"folder_id": "folders.path", "extension_id": "extensions.extension",
+                   "ctime": "datetime(entries.ctime, 'unixepoch', 'localtime')",
+                   "mtime": "datetime(entries.mtime, 'unixepoch', 'localtime')"}
+        if "文件大小" in self._headers:
+            sources["size"] = self._size_text("entries.size")
+        selected = []
+        for column, header in columns.items():
+            selected.append(f'{sources.get(column, f"entries.{column}")} AS "{header}"')
+        join = "LEFT JOIN extensions ON extensions.id = entries.extension_id" if "extension_id" in columns else ""
+        self._conn.execute(f"CREATE VIEW file_list AS SELECT {', '.join(selected)} FROM entries "
+                           f"JOIN folders ON folders.id = entries.folder_id {join} ORDER BY entries.id")
+        total_size = "文件夹总大小" + BYTES_SUFFIX
+        self._conn.execute(f"CREATE VIEW summary_view AS SELECT "
+                           f"CASE WHEN item = '{total_size}' THEN '文件夹总大小' ELSE item END AS item, "
+                           f"CASE WHEN item = '{total_size}' THEN {self._size_text('value')} ELSE value END AS value "
+                           f"FROM summary ORDER BY rowid")
+        for name, headers in self._sheets:
+            selected = []
+            for header in headers:
+                column = self._quote(header)
+                column_format = self._column_format(header)
+                if column_format == "size":
+                    selected.append(f"{self._size_text(column)} AS {self._quote(header[:-len(BYTES_SUFFIX)])}")
+                elif column_format == "time":
+                    selected.append(f"datetime({column}, 'unixepoch', 'localtime') AS {column}")
+                else:
+                    selected.append(column)
+            self._conn.execute(f"CREATE VIEW {name}_view AS SELECT {', '.join(selected)} FROM {name} ORDER BY rowid")
+
+    @staticmethod
+    def _size_text(size):
+        """与convert_size结果相同的SQL表达式：单位边界同RowFormatter，保留两位小数时同round的四舍六入五成双"""
+        def rounded(value):
+            whole = f"CAST({value} AS INTEGER)"
+            return (f"((CASE WHEN {value} - {whole} = 0.5 AND {whole} % 2 = 0 THEN {whole} "
+                    f"ELSE round({value}) END) / 100.0)")
+
+        parts = [f"CASE WHEN {size} IS NULL THEN NULL WHEN {size} = 0 THEN '0B'"]
+        for i, unit in enumerate(SIZE_UNITS[:-1]):
+            parts.append(f"WHEN {size} < {_SIZE_UNIT_THRESHOLDS[i + 1]} "
+                         f"THEN {rounded(f'{size} * 100.0 / {1024 ** i}')} || ' {unit}'")
+        parts.append(f"ELSE {rounded(f'{size} * 100.0 / {1024 ** (len(SIZE_UNITS) - 1)}')} || ' {SIZE_UNITS[-1]}' END")
+        return " ".join(parts)
+
+    def close(self):
+        if self._conn is not None:
+            self._create_views()
+            self._conn.execute("COMMIT")
+            self._conn.close()
+            self._conn = None
+            os.replace(self.path + PARTIAL_SUFFIX, self.path)
+
+    def abort(self):
+        """放弃输出并删除临时数据库"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            if os.path.exists(self.path + PARTIAL_SUFFIX):
+                os.remove(self.path + PARTIAL_SUFFIX)
+
+
+def sink_paths(sink):
+    """输出实际写出的全部文件路径（分册工作簿、多格式输出时不止一个）"""
+    return getattr(sink, "paths", None) or [sink.path]
+
+
+def raw_row_options(sink, export_options):
+    """按输出是否需要原始数值（raw_values为True，如SqliteSink）确定行选项，返回(行选项, 原始数值行选项)
+
+    全部输出都需要原始数值时直接生成原始数值的行，第二项为None；
+    与其他格式同时输出时照常格式化，另外按第二项生成一份原始数值的行，由write_rows_to分发。
+    """
+    wanted = [getattr(part, "raw_values", False) for part in getattr(sink, "sinks", [sink])]
+    if not any(wanted):
+        return export_options, None
+    raw_options = dict(export_options, raw=True)
+    if all(wanted):
+        return raw_options, None
+    return export_options, raw_options
+
+
+def write_rows_to(sink, rows, kinds, raw_rows=None):
+    """写出一批行：raw_rows不为None时raw_values输出写原始数值的行，其余输出写格式化后的行"""
+    if raw_rows is None:
+        sink.write_rows(rows, kinds)
+        return
+    for part in getattr(sink, "sinks", [sink]):
+        part.write_rows(raw_rows if getattr(part, "raw_values", False) else rows, kinds)
+
+
+def write_reports(sink, summary, typed=False, rollup=None, top=None, formatter=None):
+    """导出结束时写出统计信息，以及类型统计（按类型统计时）、文件夹汇总（rollup）和排行（top）表
+
+    与write_rows_to相同，raw_values输出写原始数值（大小为字节数、时间为时间戳），其余输出按typed写出；
+    每种写法的行只生成一次。
+    """
+    reports = {}  # 是否原始数值 -> (统计信息行, [(表名, 标题, 表头, 行)])
+
+    def build(raw):
+        values = typed or raw
+        sheets = []
+        if summary.extension_stats is not None:
+            sheets.append(("extension_stats", "类型统计", summary.extension_stats.headers(values),
+                           summary.extension_stats.rows(values)))
+        if rollup is not None:
+            sheets.append(("folder_summary", "文件夹汇总", rollup.headers(values), rollup.rows(values, formatter)))
+        if top is not None:
+            sheets.extend(top.sheets(typed, formatter, raw))
+        return summary.rows(raw), sheets
+
+    for part in getattr(sink, "sinks", [sink]):
+        raw = getattr(part, "raw_values", False)
+        if raw not in reports:
+            reports[raw] = build(raw)
+        summary_rows, sheets = reports[raw]
+        part.write_summary(summary_rows)
+        for sheet in sheets:
+            part.write_sheet(*sheet)
+
+
+class MultiSink:
+    """同时写到多个输出（如CSV和Excel）：每行只格式化一次，一次遍历扫描结果即生成所有格式"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self.path = self.sinks[0].path
+
+    @property
+    def paths(self):
+        return [path for sink in self.sinks for path in sink_paths(sink)]
+
+    def open(self, headers):
+        opened = []
+        try:
+            for sink in self.sinks:
+                sink.open(headers)
+                opened.append(sink)
+        except BaseException:
+            for sink in opened:
+                sink.abort()
+            raise
+
+    def write_rows(self, rows, kinds=None):
+        for sink in self.sinks:
+            sink.write_rows(rows, kinds)
+
+    def write_summary(self, rows):
+        for sink in self.sinks:
+            sink.write_summary(rows)
+
+    def write_sheet(self, name, title, headers, rows):
+        for sink in self.sinks:
+            sink.write_sheet(name, title, headers, rows)
+
+    def close(self):
+        """依次完成各个输出；某个输出失败时放弃其余尚未完成的输出"""
+        for i, sink in enumerate(self.sinks):
+            try:
+                sink.close()
+            except BaseException:
+                for other in self.sinks[i + 1:]:
+                    other.abort()
+                raise
+
+    def abort(self):
+        for sink in self.sinks:
+            sink.abort()
+
+
+class RowOptionsSink:
+    """只对被包装的一个输出生效的行选项，与MultiSink中的其他输出互不影响
+
+    folder_name_column为True时文件夹行的“文件名”列填写文件夹名称（只复制文件夹行，不修改共享的行）；
+    sort_types为True时统计信息中的各类型文件数量按数量从大到小排序。
+    """
+
+    def __init__(self, sink, folder_name_column=False, sort_types=False):
+        self.sink = sink
+        self.folder_name_column = folder_name_column
+        self.sort_types = sort_types
+        self.path = sink.path
+        self.extension = sink.extension
+        self.raw_values = getattr(sink, "raw_values", False)
+
+    @property
+    def paths(self):
+        return sink_paths(self.sink)
+
+    def open(self, headers):
+        self.sink.open(headers)
+
+    def write_rows(self, rows, kinds=None):
+        if self.folder_name_column and kinds is not None and KIND_DIR in kinds:
+            rows = [row if kind != KIND_DIR else [row[0], row[1], os.path.basename(row[1]), *row[3:]]
+                    for row, kind in zip(rows, kinds)]
+        self.sink.write_rows(rows, kinds)
+
+    def write_summary(self, rows):
+        if self.sort_types:
+            # 前3行为总体统计；sorted是稳定排序，数量相同的类型保持ExportSummary.rows()中的原有顺序
+            rows = rows[:3] + sorted(rows[3:], key=lambda row: row[1], reverse=True)
+        self.sink.write_summary(rows)
+
+    def write_sheet(self, name, title, headers, rows):
+        self.sink.write_sheet(name, title, headers, rows)
+
+    def close(self):
+        self.sink.close()
+
+    def abort(self):
+        self.sink.abort()
+
+
+class ScanExportPipeline:
+    """流水线模式：扫描线程把条目送入有界队列，调用线程同时格式化并写出
+
+    不保存完整的扫描结果，内存占用与条目总数无关，扫描和写出的耗时相互重叠。
+    行按扫描顺序（目录先序遍历）输出，不再按完整路径排序。
+    排行报告只包含最大文件和最久未修改文件（没有文件夹汇总）。
+    """
+
+    def __init__(self, folder_path, sink, export_options, include_subfolders=True, workers=1,
+                 queue_size=64, batch_size=1000, cancel_token=None):
+        self.folder_path = folder_path
+        self.sink = sink
+        self.export_options = export_options
+        self.include_subfolders = include_subfolders
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.summary = ExportSummary(export_options.get("ext_stats"))
+        self.rows_written = 0
+        self.cancel_token = cancel_token if cancel_token is not None else CancelToken()
+        self._stop_event = threading.Event()  # 通知扫描线程退出（取消、出错或写出结束）
+
+    def cancel(self):
+        """请求停止扫描和导出，run()随后抛出OperationCancelled"""
+        self.cancel_token.cancel()
+
+    def _produce(self, batches):
+        """扫描线程：把(文件夹相对路径, 名称, 类型, 大小, 创建时间, 修改时间)按批送入队列"""
+        try:
+            # 跳过正在写入的导出文件本身（及其临时文件）
+            exclude = set()
+            for path in sink_paths(self.sink):
+                exclude.update((os.path.abspath(path), os.path.abspath(path + PARTIAL_SUFFIX)))
+            prefixes = {os.path.join(self.folder_path, ""): ""}
+            batch = []
+            walker = make_walker(self.folder_path, self.include_subfolders, self.workers, self.cancel_token)
+            for entry in walker:
+                if self._stop_event.is_set():
+                    break
+                parent = prefixes[entry.path[:len(entry.path) - len(entry.name)]]
+                try:
+                    kind, size, ctime, mtime = ScanResult._stat_columns(entry.stat())
+                except OSError:
+                    continue
+                if kind == KIND_DIR:
+                    prefixes[os.path.join(entry.path, "")] = os.path.join(parent, entry.name)
+                elif parent == "" and os.path.abspath(entry.path) in exclude:
+                    continue
+                batch.append((parent, entry.name, kind, size, ctime, mtime))
+                if len(batch) >= self.batch_size:
+                    batches.put(batch)
+                    batch = []
+            if batch:
+                batches.put(batch)
+            batches.put(None)
+        except BaseException as e:
+            batches.put(e)
+
+    def run(self, progress=None):
+        """执行流水线，progress(已写出行数)在每批写出后调用；返回已写出的行数
+
+        被取消时抛出OperationCancelled，并删除写到一半的文件。
+        """
+        batches = queue.Queue(maxsize=self.queue_size)
+        export_options, raw_options = raw_row_options(self.sink, self.export_options)
+        raw_summary = ExportSummary()  # 原始数值的行不重复计入统计信息
+        self.sink.open(export_headers(self.export_options))
+        producer = threading.Thread(target=self._produce, args=(batches,), daemon=True)
+        producer.start()
+        index = 1  # 序号从1开始
+        formatter = RowFormatter()
+        top_k = top_report_size(self.export_options)
+        top = TopReport(self.folder_path, top_k) if top_k else None
+        completed = False
+        try:
+            while True:
+                self.cancel_token.check()
+                try:
+                    batch = batches.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if batch is None:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                if top is not None:
+                    top.add(batch)
+                rows, kinds = build_rows(index, self.folder_path, batch, export_options, self.summary, formatter)
+                raw_rows = None
+                if raw_options is not None:
+                    raw_rows = build_rows(index, self.folder_path, batch, raw_options, raw_summary, formatter)[0]
+                index += len(rows)
+                write_rows_to(self.sink, rows, kinds, raw_rows)
+                self.rows_written += len(rows)
+                if progress is not None:
+                    progress(self.rows_written)
+            # 扫描线程因取消而提前结束时，不把不完整的结果当作成功输出
+            self.cancel_token.check()
+            write_reports(self.sink, self.summary, self.export_options.get("typed"), top=top, formatter=formatter)
+            completed = True
+        finally:
+            # 出错或被取消时让扫描线程尽快退出（清空队列以免其阻塞在put上）
+            self._stop_event.set()
+            while producer.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if completed:
+                self.sink.close()
+            else:
+                self.sink.abort()
+        return self.rows_written
+
+
+def export_result(result, sink, export_options, progress=None, batch_size=1000, cancel_token=None, restat_workers=0):
+    """把扫描结果按路径排序写入sink，progress(已处理条目数, 条目总数)在每批写出后调用
+
+    返回导出统计信息（ExportSummary）。cancel_token在每批写出前检查，
+    被取消或出错时抛出异常并删除写到一半的文件。restat_workers见iter_export_batches。
+    export_options["rollup"]为True时先计算各文件夹的汇总（FolderRollup），文件夹行写出总大小，
+    并额外写出“文件夹汇总”表（总大小、文件数、子文件夹数）。
+    export_options["top"]为True时额外写出前top_k名的排行表（TopReport）；
+    export_options["ext_stats"]为True时统计信息之后写出按文件类型的分布和分位数（ExtensionStats）。
+    """
+    summary = ExportSummary(export_options.get("ext_stats"))
+    total_items = len(result)
+    rollup = FolderRollup(result) if export_options.get("rollup") else None
+    top_k = top_report_size(export_options)
+    top = TopReport(result.folder_path, top_k, folders=rollup is not None) if top_k else None
+    sink.open(export_headers(export_options))
+    row_options, raw_options = raw_row_options(sink, export_options)
+    completed = False
+    try:
+        for position, rows, kinds, raw_rows in iter_export_batches(result, row_options, summary, restat_workers,
+                                                                   batch_size, rollup, top, raw_options):
+            if cancel_token is not None:
+                cancel_token.check()
+            write_rows_to(sink, rows, kinds, raw_rows)
+            if progress is not None:
+                progress(position, total_items)
+        write_reports(sink, summary, export_options.get("typed"), rollup, top)
+        if progress is not None:
+            progress(total_items, total_items)
+        completed = True
+    finally:
+        if completed:
+            sink.close()
+        else:
+            sink.abort()
+    return summary
+
+
+class ProgressPrinter:
+    """命令行进度输出：按时间节流写到stderr，并显示每秒处理的条目数"""
+
+    def __init__(self, label, stream=None, interval=0.5):
+        self.label = label
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.start_time = time.perf_counter()
+        self._last_report = 0.0
+
+    def rate(self, count):
+        elapsed = time.perf_counter() - self.start_time
+        return count / elapsed if elapsed > 0 else 0.0
+
+    def __call__(self, count, total=None):
+        now = time.perf_counter()
+        if now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        done = f"{count}/{total}" if total else f"{count}"
+        self.stream.write(f"\r{self.label}: {done} 项 ({self.rate(count):,.0f} 项/秒)")
+        self.stream.flush()
+
+    def finish(self, count):
+        elapsed = time.perf_counter() - self.start_time
+        self.stream.write(f"\r{self.label}完成: {count} 项，用时 {elapsed:.1f} 秒 ({self.rate(count):,.0f} 项/秒)\n")
+        self.stream.flush()
+
+
+SINKS = {
+    "csv": CsvSink,
+    "xlsx": ExcelSink,
+    "xlsx-styled": StyledExcelSink,
+    "parquet": ParquetSink,
+    "sqlite": SqliteSink,
+}
+
+
+def main(argv=None):
+    """命令行入口：python -m file2excel scan ROOT --format csv,xlsx --out PATH（不导入tkinter）"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m file2excel", description="文件信息导出工具（命令行模式）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scan_parser = subparsers.add_parser("scan", help="扫描文件夹并导出文件信息")
+    scan_parser.add_argument("root", help="要扫描的文件夹")
+    scan_parser.add_argument("--format", default="csv",
+                             help=f"导出格式，可选{','.join(sorted(SINKS))}；逗号分隔多个格式时一次遍历同时写出（默认csv）")
+    scan_parser.add_argument("--out", help="导出文件路径（默认保存在扫描目录下，以文件夹名命名；多个格式时按格式替换扩展名）")
+    scan_parser.add_argument("--fields", default="size,ctime,mtime",
+                             help="导出的列，逗号分隔，可选size,ctime,mtime,ext,path（默认size,ctime,mtime）")
+    scan_parser.add_argument("--no-subfolders", action="store_true", help="不包含子文件夹")
+    scan_parser.add_argument("--workers", type=int, default=1, help="并行扫描线程数（默认1）")
+    scan_parser.add_argument("--use-cache", action="store_true", help="使用缓存索引，只重新读取有变化的目录")
+    scan_parser.add_argument("--stream", action="store_true", help="流水线模式：边扫描边写出，按扫描顺序输出，内存占用恒定")
+    scan_parser.add_argument("--restat", type=int, default=0, metavar="N",
+                             help="导出前用N个线程重新读取每个条目的文件信息（配合--use-cache或网络共享使用，默认不重新读取）")
+    scan_parser.add_argument("--rollup", action="store_true",
+                             help="文件夹行写出该文件夹（含子文件夹）的总大小，并额外输出“文件夹汇总”表")
+    scan_parser.add_argument("--top", type=int, default=0, metavar="K",
+                             help="额外输出最大文件、最大文件夹（需--rollup）和最久未修改文件的前K名排行表")
+    scan_parser.add_argument("--ext-stats", action="store_true",
+                             help="按文件类型统计总大小、大小和修改时间分布以及P50/P90/P99大小，写在统计信息之后")
+    scan_parser.add_argument("--typed", action="store_true",
+                             help="写出原始数值：文件大小为字节数，时间为Excel日期时间单元格（CSV中为同样格式的文本）")
+    scan_parser.add_argument("--compress", choices=sorted(CSV_COMPRESSIONS),
+                             help="csv格式压缩输出（gzip/bz2/xz），压缩在后台线程中与写出同时进行")
+    scan_parser.add_argument("--compress-level", type=int, metavar="N",
+                             help="压缩级别（gzip/bz2为1-9，xz为0-9；默认gzip和xz为6，bz2为9）")
+    scan_parser.add_argument("--engine", choices=sorted(EXCEL_ENGINES), default="openpyxl",
+                             help="xlsx格式的写出引擎：openpyxl或内置引擎native（更快，默认openpyxl）")
+    scan_parser.add_argument("--rollover", choices=("sheet", "workbook"), default="sheet",
+                             help="xlsx超过单表行数上限时换到新工作表（sheet，默认）或新的编号工作簿（workbook）")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        parser.error(f"文件夹路径不存在: {args.root}")
+    fields = {field.strip() for field in args.fields.split(",") if field.strip()}
+    unknown = fields - {"size", "ctime", "mtime", "ext", "path"}
+    if unknown:
+        parser.error(f"未知的列: {', '.join(sorted(unknown))}")
+    export_options = {key: key in fields for key in ("size", "ctime", "mtime", "ext", "path")}
+    export_options["typed"] = args.typed
+    export_options["rollup"] = args.rollup
+    export_options["top"] = args.top > 0
+    export_options["top_k"] = args.top
+    export_options["ext_stats"] = args.ext_stats
+    if args.rollup and args.stream:
+        parser.error("--rollup需要完整的扫描结果，不能与--stream同时使用")
+    if args.use_cache and args.stream:
+        parser.error("--use-cache只用于先扫描后导出，不能与--stream同时使用")
+    if args.restat and args.stream:
+        parser.error("--restat用于导出前重新读取扫描结果，不能与--stream同时使用")
+    include_subfolders = not args.no_subfolders
+    formats = [fmt.strip() for fmt in args.format.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in SINKS]
+    if unknown or not formats:
+        parser.error(f"未知的导出格式: {', '.join(unknown) or args.format}")
+    sinks = []
+    for fmt in formats:
+        if fmt in ("xlsx", "xlsx-styled"):
+            sink_class = excel_sink_class(args.engine, styled=fmt == "xlsx-styled")
+            sink_options = {"rollover": args.rollover}
+        elif fmt == "csv" and args.compress:
+            sink_class = CompressedCsvSink
+            sink_options = {"compression": args.compress, "level": args.compress_level}
+        else:
+            sink_class, sink_options = SINKS[fmt], {}
+            if sink_class is ParquetSink:
+                sink_options = {"typed": args.typed}
+        extension = sink_class.extension
+        if sink_class is CompressedCsvSink:
+            extension = CompressedCsvSink.extension_for(args.compress)
+        if args.out and len(formats) > 1:
+            path = os.path.splitext(args.out)[0] + extension
+        else:
+            path = args.out or default_output_path(args.root, extension)
+        sinks.append(sink_class(path, **sink_options))
+    if len({sink.path for sink in sinks}) < len(sinks):
+        parser.error("多个导出格式的文件路径相同（xlsx与xlsx-styled不能同时导出）")
+    sink = sinks[0] if len(sinks) == 1 else MultiSink(sinks)
+
+    try:
+        if args.stream:
+            pipeline = ScanExportPipeline(args.root, sink, export_options, include_subfolders, args.workers)
+            printer = ProgressPrinter("扫描并导出")
+            rows = pipeline.run(progress=printer)
+            printer.finish(rows)
+        else:
+            result = ScanResult(args.root)
+            index = ScanIndex() if args.use_cache else None
+            printer = ProgressPrinter("扫描")
+            try:
+                for count, _ in enumerate(iter_scan(result, include_subfolders, args.workers, index), 1):
+                    if count % 1000 == 0:
+                        printer(count)
+            finally:
+                if index is not None:
+                    index.close()
+            result.finish()
+            printer.finish(len(result))
+            printer = ProgressPrinter("导出")
+            summary = export_result(result, sink, export_options, progress=printer, restat_workers=args.restat)
+            printer.finish(summary.file_count + summary.folder_count)
+    except KeyboardInterrupt:
+        sys.stderr.write("\n已取消\n")
+        return 130
+    except Exception as e:
+        sys.stderr.write(f"\n导出失败: {e}\n")
+        return 1
+    sys.stderr.write(f"文件信息已导出到: {', '.join(sink_paths(sink))}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
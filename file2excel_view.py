@@ -0,0 +1,169 @@
+"""界面辅助组件：工作线程到Tk主线程的事件队列，以及只渲染可见行的虚拟文件列表"""
+import queue
+import threading
+import tkinter as tk
+import tkinter.font as tkfont
+from array import array
+
+from file2excel_core import KIND_DELETED
+
+
+class UIEventBus:
+    """线程安全的界面事件队列：工作线程只投递事件，由Tk主线程按固定帧率统一处理
+    Tk控件只能在主线程中操作；进度类事件只保留最新一次，界面开销与每秒处理的条目数无关"""
+
+    def __init__(self, window, interval=50):
+        self.window = window
+        self.interval = interval  # 刷新间隔（毫秒），50即每秒20帧
+        self._events = queue.SimpleQueue()
+        self._latest = {}  # 函数 -> 最新参数，同一帧内多次投递只执行最后一次
+        self._lock = threading.Lock()
+        window.after(interval, self._drain)
+
+    def post(self, func, *args, **kwargs):
+        """投递一次在主线程中执行的调用（状态文字、按钮状态、弹窗等），按投递顺序执行"""
+        self._events.put((func, args, kwargs))
+
+    def latest(self, func, *args, **kwargs):
+        """投递可合并的调用（进度条等），每帧只执行最新一次"""
+        with self._lock:
+            self._latest[func] = (args, kwargs)
+
+    def _drain(self):
+        try:
+            with self._lock:
+                latest, self._latest = self._latest, {}
+            for func, (args, kwargs) in latest.items():
+                func(*args, **kwargs)
+            while True:
+                try:
+                    func, args, kwargs = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args, **kwargs)
+        finally:
+            self.window.after(self.interval, self._drain)
+
+
+class ScanResultRows:
+    """把ScanResult适配为虚拟列表的数据源：按扫描顺序给出未删除条目的完整路径
+
+    实时监控线程在持有result.lock时逐列追加或标记条目，读取时同样持有该锁，不会读到只写了一部分的条目。
+    """
+
+    def __init__(self, result):
+        self.result = result
+        self._indices = None  # 显示行号 -> 条目编号；没有删除标记时为range，不占额外内存
+
+    def invalidate(self):
+        """扫描结果有增删（实时监控）后调用，下次访问时重建行号映射"""
+        self._indices = None
+
+    def _row_indices(self):
+        if self._indices is None:
+            kinds = self.result.kinds
+            if KIND_DELETED in kinds:
+                self._indices = array("i", (i for i, kind in enumerate(kinds) if kind != KIND_DELETED))
+            else:
+                self._indices = range(len(kinds))
+        return self._indices
+
+    def __len__(self):
+        with self.result.lock:
+            return len(self._row_indices())
+
+    def __getitem__(self, row):
+        with self.result.lock:
+            return self.result.path(self._row_indices()[row])
+
+
+class VirtualListbox(tk.Listbox):
+    """虚拟列表框：只把可见的几十行放进Tk Listbox，滚动按下标进行
+    数据源只需支持len()和下标访问，Tk侧的内存和绘制开销与总行数无关"""
+
+    def __init__(self, master, scrollbar, **options):
+        super().__init__(master, **options)
+        self.scrollbar = scrollbar
+        self.rows = ()
+        self.first = 0  # 首个可见行的下标
+        self.visible = 1  # 窗口能容纳的行数
+        self.selected = set()  # 选中行的下标，滚动后仍保留
+        self._row_height = tkfont.Font(font=self.cget("font")).metrics("linespace") + 1
+        scrollbar.config(command=self.yview)
+
+        self.bind("<Configure>", self._on_configure)
+        self.bind("<<ListboxSelect>>", self._on_select)
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.bind("<Up>", lambda e: self._scroll_by(-1))
+        self.bind("<Down>", lambda e: self._scroll_by(1))
+        self.bind("<Prior>", lambda e: self._scroll_by(-self.visible))
+        self.bind("<Next>", lambda e: self._scroll_by(self.visible))
+        self.bind("<Control-Home>", lambda e: self._scroll_to(0))
+        self.bind("<Control-End>", lambda e: self._scroll_to(len(self.rows)))
+
+    def set_rows(self, rows):
+        """更换数据源并回到顶部"""
+        self.rows = rows
+        self.first = 0
+        self.selected.clear()
+        self.refresh()
+
+    def size(self):
+        """总行数（而不是Tk中实际存在的可见行数）"""
+        return len(self.rows)
+
+    def refresh(self):
+        """重新渲染可见行，数据源内容变化后调用"""
+        total = len(self.rows)
+        self.first = max(0, min(self.first, total - self.visible))
+        last = min(total, self.first + self.visible + 1)  # 多取一行填满最下方的半行
+        super().delete(0, tk.END)
+        if last > self.first:
+            super().insert(tk.END, *(self.rows[i] for i in range(self.first, last)))
+            for i in range(self.first, last):
+                if i in self.selected:
+                    self.selection_set(i - self.first)
+        if total:
+            self.scrollbar.set(self.first / total, min(total, self.first + self.visible) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """滚动条回调：moveto按比例定位，scroll按行或按页移动"""
+        total = len(self.rows)
+        if not args:
+            if not total:
+                return 0.0, 1.0
+            return self.first / total, min(total, self.first + self.visible) / total
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * total))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self._scroll_by(step * self.visible if args[2] == "pages" else step)
+
+    def _scroll_to(self, first):
+        self.first = first
+        self.refresh()
+        return "break"
+
+    def _scroll_by(self, rows):
+        return self._scroll_to(self.first + rows)
+
+    def _on_mousewheel(self, event):
+        # Windows每格为120，macOS为较小的整数
+        step = -event.delta // 120 * 3 if abs(event.delta) >= 120 else -event.delta
+        return self._scroll_by(step)
+
+    def _on_configure(self, event):
+        border = 2 * (int(self.cget("borderwidth")) + int(self.cget("highlightthickness")))
+        visible = max(1, (event.height - border) // self._row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def _on_select(self, event):
+        shown = super().size()
+        self.selected.difference_update(range(self.first, self.first + shown))
+        self.selected.update(self.first + i for i in self.curselection())
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import warnings
+
+import pytest
+
+from file2excel_core import convert_size, main
+
+
+def make_tree(root):
+    """a中约97 KB、z中约1.29 MB：按文本排序时“97.43 KB”会排在“1.29 MB”之前"""
+    for folder, name, size in (("a", "small.txt", 99770), ("z", "large.bin", 1352663), ("", "top.txt", 10)):
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        with open(os.path.join(root, folder, name), "wb") as f:
+            f.write(b"x" * size)
+
+
+def export(tmp_path, *options):
+    root = tmp_path / "tree"
+    make_tree(root)
+    out = tmp_path / "out.sqlite3"
+    main(["scan", str(root), "--format", "sqlite", "--out", str(out), "--fields", "size,mtime,ext", *options])
+    return sqlite3.connect(out)
+
+
+def test_folder_summary_orders_by_size(tmp_path):
+    conn = export(tmp_path, "--rollup")
+    rows = conn.execute('SELECT "文件夹", "总大小（字节）" FROM folder_summary ORDER BY "总大小（字节）" DESC').fetchall()
+    assert [folder for folder, _ in rows] == ["（根目录）", "z", "a"]
+    assert rows[0][1] == 99770 + 1352663 + 10
+    assert conn.execute("SELECT \"总大小\" FROM folder_summary_view WHERE \"文件夹\" = 'a'").fetchone() == ("97.43 KB",)
+
+
+def column_types(conn, table):
+    """每列中出现过的存储类型（typeof），按列名"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    return {column: {row[0] for row in conn.execute(f'SELECT DISTINCT typeof("{column}") FROM {table}')}
+            for column in columns}
+
+
+@pytest.mark.parametrize("typed", [False, True])
+def test_top_reports_store_integers(tmp_path, typed):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)  # 不经过sqlite3已弃用的datetime默认转换
+        conn = export(tmp_path, "--rollup", "--top", "5", *(["--typed"] if typed else []))
+    for table, size_column in (("top_files", "文件大小（字节）"), ("top_folders", "总大小（字节）"),
+                               ("oldest_files", "文件大小（字节）")):
+        types = column_types(conn, table)
+        assert types[size_column] == {"integer"}
+        assert types["修改时间"] == {"integer"}
+    assert conn.execute('SELECT "文件路径", "文件大小（字节）" FROM top_files ORDER BY "排名" LIMIT 1').fetchone()[1] == 1352663
+    assert conn.execute('SELECT "文件大小" FROM top_files_view LIMIT 1').fetchone() == ("1.29 MB",)
+
+
+def test_extension_stats_store_integers(tmp_path):
+    conn = export(tmp_path, "--ext-stats")
+    types = column_types(conn, "extension_stats")
+    for column in ("文件数", "总大小（字节）", "P50（字节）", "P90（字节）", "P99（字节）"):
+        assert types[column] == {"integer"}
+    total = conn.execute("SELECT \"总大小（字节）\" FROM extension_stats WHERE \"文件类型\" = '（全部）'").fetchone()
+    assert total == (99770 + 1352663 + 10,)
+    assert conn.execute("SELECT value FROM summary WHERE item = '文件夹总大小（字节）'").fetchone() == total
+    assert conn.execute("SELECT value FROM summary_view WHERE item = '文件夹总大小'").fetchone() == (convert_size(total[0]),)